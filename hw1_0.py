@@ -1,11 +1,74 @@
 from pysat.formula import CNF
 from pysat.solvers import Solver
+import time
 
 
-def create_and_solve_psi():
+class SolverSession:
+    """
+    A single incremental solver shared by a sequence of queries.
+
+    The formula is loaded once and only clauses added since the last sync are
+    passed on afterwards, so learned clauses are kept between solve() calls
+    instead of being rebuilt for every query.
+
+    Args:
+        name (str): The PySAT solver name.
+    """
+
+    def __init__(self, name="m22"):
+        self.solver = Solver(name=name)
+        self.loaded = 0
+
+    def sync(self, formula):
+        """
+        Adds the clauses appended to an append-only formula since the last sync.
+
+        Args:
+            formula (CNF): The formula tracked by this session.
+        """
+        self.solver.append_formula(formula.clauses[self.loaded :])
+        self.loaded = len(formula.clauses)
+
+    def add_clause(self, clause):
+        """Adds a clause that is not part of the tracked formula."""
+        self.solver.add_clause(clause)
+
+    def solve(self, assumptions=()):
+        """Solves under the given assumptions; see Solver.solve."""
+        return self.solver.solve(assumptions=assumptions)
+
+    def get_model(self):
+        return self.solver.get_model()
+
+    def get_core(self):
+        return self.solver.get_core()
+
+    def delete(self):
+        self.solver.delete()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.delete()
+
+
+def _open_solver(psi, session):
+    # Returns (solver, owned): a fresh solver for psi, or the synced session.
+    if session is None:
+        return Solver(bootstrap_with=psi), True
+    session.sync(psi)
+    return session, False
+
+
+def create_and_solve_psi(session=None):
     """
     Part 1: Create a specific CNF formula and solve it.
 
+    Args:
+        session (SolverSession): Solve with this session instead of a fresh
+            solver. Optional.
+
     Returns:
         tuple: (psi, model)
         - psi (CNF): The PySAT CNF object.
@@ -18,22 +81,25 @@ def create_and_solve_psi():
     psi.append([-2, 3])
     psi.append([-3, 4])
 
-    solver = Solver(bootstrap_with=psi)
+    solver, owned = _open_solver(psi, session)
     sat = solver.solve()
 
     model = solver.get_model() if sat else []
 
-    solver.delete()
+    if owned:
+        solver.delete()
 
     return psi, model
 
 
-def modify_and_check(psi):
+def modify_and_check(psi, session=None):
     """
     Part 2: Modify an existing formula and check satisfiability.
 
     Args:
         psi (CNF): The formula object from Part 1.
+        session (SolverSession): Session used in Part 1; only the new clause
+            is added to it. Optional.
 
     Returns:
         tuple: (psi, is_satisfiable)
@@ -42,37 +108,151 @@ def modify_and_check(psi):
     """
     psi.append([-4, -1])
 
-    solver = Solver(bootstrap_with=psi)
+    solver, owned = _open_solver(psi, session)
     is_satisfiable = solver.solve()
 
-    solver.delete()
+    if owned:
+        solver.delete()
 
     return psi, is_satisfiable
 
 
-def add_assumptions(psi):
+def add_assumptions(psi, session=None, minimize=None):
     """
     Part 3: Incremental SAT solving.
 
     Args:
         psi (CNF): The formula object from Part 2.
+        session (SolverSession): Session used in Part 2. Optional.
+        minimize (str): Shrink the core with `minimize_core` using this method
+            ("deletion" or "quickxplain"). Optional.
 
     Returns:
         tuple: (status, result)
         - status (bool): True if satisfiable, False if unsatisfiable.
         - result (list): The model (if status is True) or the unsatisfiable core (if status is False).
     """
-    solver = Solver(bootstrap_with=psi)
+    solver, owned = _open_solver(psi, session)
 
     # Assumptions: (x1 ∧ x2 ∧ x3 ∧ x4)
     status = solver.solve(assumptions=[1, 2, 3, 4])
     result = solver.get_model() if status else solver.get_core()
+    if not status and minimize is not None:
+        result = minimize_core(solver, result, method=minimize)
 
-    solver.delete()
+    if owned:
+        solver.delete()
 
     return status, result
 
 
+class _BudgetExceeded(Exception):
+    pass
+
+
+def _out_of_budget(deadline):
+    return deadline is not None and time.perf_counter() > deadline
+
+
+def _deletion(solver, core, deadline):
+    # Every intermediate core is valid, so running out of budget just stops
+    i = 0
+    while i < len(core) and not _out_of_budget(deadline):
+        candidate = core[:i] + core[i + 1 :]
+        if solver.solve(assumptions=candidate):
+            # core[i] is necessary, and stays necessary in every subset
+            i += 1
+        else:
+            # The solver's own core of the candidate may drop several at once
+            found = set(solver.get_core() or [])
+            core = [lit for lit in candidate if lit in found]
+    return core
+
+
+def _quickxplain(solver, background, has_delta, constraints, deadline):
+    # Junker's QuickXplain over assumption literals
+    if has_delta and not solver.solve(assumptions=background):
+        return []
+    if len(constraints) == 1:
+        return constraints
+    if _out_of_budget(deadline):
+        raise _BudgetExceeded()
+    k = len(constraints) // 2
+    c1, c2 = constraints[:k], constraints[k:]
+    d2 = _quickxplain(solver, background + c1, bool(c1), c2, deadline)
+    d1 = _quickxplain(solver, background + d2, bool(d2), c1, deadline)
+    return d1 + d2
+
+
+def minimize_core(solver, core, method="deletion", budget=None):
+    """
+    Shrinks an unsatisfiable core of assumptions to a minimal one.
+
+    The same solver is queried repeatedly under subsets of the core, so its
+    learned clauses carry over between the queries.
+
+    Args:
+        solver (Solver or SolverSession): A solver in which the assumptions
+            in `core` are unsatisfiable.
+        core (list): Assumption literals, e.g. from get_core().
+        method (str): "deletion" (linear, refines with the solver's cores) or
+            "quickxplain" (divide and conquer, fewer calls on small cores).
+        budget (float): Time budget in seconds, checked between solver calls.
+            Optional.
+
+    Returns:
+        list: A subset of `core` that is still unsatisfiable. It is minimal
+        unless the budget ran out, in which case deletion returns the
+        smallest core found so far and quickxplain returns `core` unchanged.
+    """
+    deadline = None if budget is None else time.perf_counter() + budget
+    core = list(core)
+
+    if method == "deletion":
+        return _deletion(solver, core, deadline)
+
+    if method == "quickxplain":
+        if not core:
+            return core
+        try:
+            return _quickxplain(solver, [], False, core, deadline)
+        except _BudgetExceeded:
+            return core
+
+    raise ValueError(f"Unknown core minimization method: {method}")
+
+
+def clause_mus(clauses, method="deletion", budget=None, name="m22"):
+    """
+    Extracts a minimal unsatisfiable subset (MUS) of clauses.
+
+    Every clause gets a fresh selector literal s (the solver sees the clause
+    plus -s), so assuming s switches the clause on and the clause-level MUS
+    becomes an assumption-level minimal core over the selectors.
+
+    Args:
+        clauses (list): The clauses, as lists of ints.
+        method (str): Minimization method, see `minimize_core`.
+        budget (float): Time budget in seconds. Optional.
+        name (str): The PySAT solver name.
+
+    Returns:
+        list: Indices into `clauses` of the MUS, or None if the clauses are
+        satisfiable.
+    """
+    top = max((abs(lit) for clause in clauses for lit in clause), default=0)
+    selectors = list(range(top + 1, top + len(clauses) + 1))
+
+    with SolverSession(name) as session:
+        for sel, clause in zip(selectors, clauses):
+            session.add_clause(list(clause) + [-sel])
+        if session.solve(assumptions=selectors):
+            return None
+        core = minimize_core(session, session.get_core(), method, budget)
+
+    return sorted(sel - top - 1 for sel in core)
+
+
 if __name__ == "__main__":
     # You can use this block to test your code locally
     print("--- Testing Part 1 ---")
@@ -91,3 +271,17 @@ if __name__ == "__main__":
         print(f"Satisfiable with Model: {result}")
     else:
         print(f"Unsatisfiable with Core: {result}")
+
+    print("\n--- Testing Parts 1-3 with one incremental session ---")
+    with SolverSession() as session:
+        my_psi, my_model = create_and_solve_psi(session)
+        my_psi, is_sat = modify_and_check(my_psi, session)
+        status, result = add_assumptions(my_psi, session)
+        print(f"Model: {my_model}, Is Satisfiable?: {is_sat}")
+        print(f"Status: {status}, Model/Core: {result}")
+
+    print("\n--- Minimal core and MUS of Part 3 ---")
+    status, result = add_assumptions(my_psi, minimize="quickxplain")
+    print(f"Minimal core: {result}")
+    mus = clause_mus(my_psi.clauses + [[1], [2], [3], [4]])
+    print(f"MUS clause indices: {mus}")
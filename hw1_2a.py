@@ -1,10 +1,27 @@
+from pysat.card import CardEnc, EncType
 from pysat.formula import CNF
 from pysat.solvers import Solver
+import gc
+import math
+import multiprocessing
+import numpy as np
+import queue
+import threading
 import time
-import matplotlib.pyplot as plt
 
+# At-most-one encodings for the "no hole has two pigeons" constraints
+AMO_ENCODINGS = ("pairwise", "seqcounter", "commander", "product", "bitwise")
 
-def pigeonhole(n: int):
+# PySAT backends raced against each other by solve_portfolio
+PORTFOLIO = ("m22", "cadical153", "glucose4", "lingeling", "maplechrono")
+
+
+def pigeonhole(
+    n: int,
+    vectorized: bool = False,
+    amo: str = "pairwise",
+    symmetry_breaking: bool = False,
+):
     """
     Generates the CNF formula for the Pigeon-hole principle problem.
 
@@ -13,10 +30,32 @@ def pigeonhole(n: int):
 
     Args:
         n (int): The number of pigeons (implies n-1 holes).
+        vectorized (bool): Build the clauses with NumPy (see `pigeonhole_flat`)
+            and load them in bulk instead of appending them one by one.
+        amo (str): At-most-one encoding used per hole, one of AMO_ENCODINGS.
+            Everything but "pairwise" introduces auxiliary variables, numbered
+            after the n*(n-1) placement variables.
+        symmetry_breaking (bool): Add the lex-leader constraints from
+            `symmetry_breaking_clauses`, which let unit propagation alone
+            refute the formula.
     Returns:
         formula (CNF): A PySAT CNF formula representing the problem.
     """
 
+    if amo not in AMO_ENCODINGS:
+        raise ValueError(f"Unknown at-most-one encoding: {amo}")
+
+    if vectorized:
+        if amo != "pairwise":
+            raise ValueError("vectorized mode only supports the pairwise encoding")
+        # Bulk load: CNF(from_clauses=...) would rescan every clause for nv
+        formula = CNF()
+        formula.clauses = flat_to_clauses(*pigeonhole_flat(n))
+        formula.nv = n * (n - 1)
+        if symmetry_breaking:
+            formula.clauses.extend(symmetry_breaking_clauses(n))
+        return formula
+
     # TODO: Implement this function. Currently, this is a placeholder.
     # You must return a CNF object representing the encoding of the formula.
     formula = CNF()
@@ -31,14 +70,318 @@ def pigeonhole(n: int):
         formula.append([var(i, j) for j in range(holes)])
 
     # No hole has two pigeons
-    for k in range(holes):
-        for i in range(n):
-            for j in range(i + 1, n):
-                formula.append([-var(i, k), -var(j, k)])
+    if amo == "pairwise":
+        for k in range(holes):
+            for i in range(n):
+                for j in range(i + 1, n):
+                    formula.append([-var(i, k), -var(j, k)])
+    else:
+        top = n * holes
+        for k in range(holes):
+            clauses, top = at_most_one([var(i, k) for i in range(n)], top, amo)
+            formula.extend(clauses)
+        formula.nv = max(formula.nv, top)
+
+    if symmetry_breaking:
+        formula.extend(symmetry_breaking_clauses(n))
 
     return formula
 
 
+def symmetry_breaking_clauses(n: int):
+    """
+    Generates lex-leader symmetry-breaking clauses for the pigeon-hole problem.
+
+    Pigeons are interchangeable and so are holes. Any placement can be turned
+    into one where pigeon i sits in a lower hole than pigeon i+1 (sort the
+    pigeons), and where hole j is only used once hole j-1 is used by an
+    earlier pigeon (relabel the holes in order of first use). Both orderings
+    hold at the same time, so the clauses below preserve satisfiability.
+
+    Args:
+        n (int): The number of pigeons (implies n-1 holes).
+    Returns:
+        clauses (list): Clauses over the placement variables of `pigeonhole`.
+    """
+    holes = n - 1
+
+    def var(i, j):
+        return i * holes + j + 1
+
+    clauses = []
+
+    # Pigeon symmetry: x_{i+1,j} -> x_{i,j'} for some j' < j
+    for i in range(n - 1):
+        for j in range(holes):
+            clauses.append([-var(i + 1, j)] + [var(i, jj) for jj in range(j)])
+
+    # Hole symmetry (value precedence): x_{i,j} -> x_{i',j-1} for some i' < i
+    for j in range(1, holes):
+        for i in range(n):
+            clauses.append([-var(i, j)] + [var(ii, j - 1) for ii in range(i)])
+
+    return clauses
+
+
+def at_most_one(lits, top: int, encoding: str):
+    """
+    Encodes "at most one of lits is true" with the given encoding.
+
+    Args:
+        lits (list): The literals to constrain.
+        top (int): The largest variable id in use; auxiliary variables are
+            allocated above it.
+        encoding (str): One of AMO_ENCODINGS.
+    Returns:
+        tuple: (clauses, top)
+        - clauses (list): The encoding clauses.
+        - top (int): The largest variable id in use afterwards.
+    """
+    if len(lits) <= 1:
+        return [], top
+
+    if encoding == "pairwise":
+        clauses = [
+            [-lits[i], -lits[j]]
+            for i in range(len(lits))
+            for j in range(i + 1, len(lits))
+        ]
+        return clauses, top
+
+    if encoding in ("seqcounter", "bitwise"):
+        enc = CardEnc.atmost(
+            lits, bound=1, top_id=top, encoding=getattr(EncType, encoding)
+        )
+        return enc.clauses, max(top, enc.nv)
+
+    if encoding == "commander":
+        # Klieber & Kwon: groups of 3 share a commander variable that is
+        # implied by every member; at most one commander may be true.
+        if len(lits) <= 3:
+            return at_most_one(lits, top, "pairwise")
+        clauses, commanders = [], []
+        for g in range(0, len(lits), 3):
+            group = lits[g : g + 3]
+            top += 1
+            commanders.append(top)
+            clauses.extend(at_most_one(group, top, "pairwise")[0])
+            clauses.extend([-x, top] for x in group)
+        rest, top = at_most_one(commanders, top, "commander")
+        return clauses + rest, top
+
+    if encoding == "product":
+        # Chen's 2-product: lay lits out on a p x q grid; each literal implies
+        # its row and column variable, and both of those are at-most-one.
+        if len(lits) <= 4:
+            return at_most_one(lits, top, "pairwise")
+        p = math.ceil(math.sqrt(len(lits)))
+        q = math.ceil(len(lits) / p)
+        rows = list(range(top + 1, top + p + 1))
+        cols = list(range(top + p + 1, top + p + q + 1))
+        top += p + q
+        clauses = []
+        for idx, x in enumerate(lits):
+            clauses.append([-x, rows[idx // q]])
+            clauses.append([-x, cols[idx % q]])
+        for group in (rows, cols):
+            more, top = at_most_one(group, top, "product")
+            clauses.extend(more)
+        return clauses, top
+
+    raise ValueError(f"Unknown at-most-one encoding: {encoding}")
+
+
+def encoding_size(formula, n: int):
+    """
+    Reports the size of a pigeon-hole formula built by `pigeonhole`.
+
+    Args:
+        formula (CNF): The formula.
+        n (int): The number of pigeons it was built for.
+    Returns:
+        dict: Number of clauses, literals and auxiliary variables.
+    """
+    return {
+        "clauses": len(formula.clauses),
+        "literals": sum(len(clause) for clause in formula.clauses),
+        "aux_vars": formula.nv - n * (n - 1),
+    }
+
+
+def pigeonhole_flat(n: int):
+    """
+    Generates the pigeon-hole clauses as flat NumPy buffers.
+
+    Every clause is emitted at once from index arrays, so no Python list is
+    allocated per clause. Clause c is lits[offsets[c]:offsets[c + 1]], and the
+    clauses come out in the same order as in `pigeonhole`.
+
+    Args:
+        n (int): The number of pigeons (implies n-1 holes).
+    Returns:
+        tuple: (lits, offsets)
+        - lits (np.ndarray): int32 buffer holding the literals of all clauses.
+        - offsets (np.ndarray): int64 clause start offsets, of length
+          num_clauses + 1.
+    """
+    holes = n - 1
+    var = np.arange(1, n * holes + 1, dtype=np.int32).reshape(n, holes)
+
+    # Each pigeon in some hole: row i of var is one clause
+    alo = var.ravel()
+    alo_offsets = np.arange(n, dtype=np.int64) * holes
+
+    # No hole has two pigeons: one binary clause per (hole, pigeon pair)
+    i, j = np.triu_indices(n, k=1)
+    amo = -np.stack([var[i].T, var[j].T], axis=-1).ravel()
+    amo_offsets = alo.size + 2 * np.arange(amo.size // 2 + 1, dtype=np.int64)
+
+    lits = np.concatenate([alo, amo]).astype(np.int32, copy=False)
+    offsets = np.concatenate([alo_offsets, amo_offsets])
+    return lits, offsets
+
+
+def flat_to_clauses(lits, offsets):
+    """
+    Converts a flat (lits, offsets) buffer into a list of PySAT clauses.
+
+    Consecutive clauses of equal width are reshaped into one 2D block and
+    converted with a single tolist() call, which is what makes bulk loading
+    cheap: pigeonhole_flat produces just two such runs.
+
+    Args:
+        lits (np.ndarray): Flat literal buffer.
+        offsets (np.ndarray): Clause start offsets, of length num_clauses + 1.
+    Returns:
+        clauses (list): A list of clauses (lists of ints), in buffer order.
+    """
+    widths = np.diff(offsets)
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(widths)) + 1, [widths.size]))
+
+    # Millions of small lists would otherwise trigger repeated GC passes
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        clauses = []
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            if lo == hi:
+                continue
+            block = lits[offsets[lo] : offsets[hi]].reshape(hi - lo, widths[lo])
+            clauses.extend(block.tolist())
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return clauses
+
+
+def _portfolio_worker(name, clauses, results):
+    start = time.perf_counter()
+    try:
+        with Solver(name=name, bootstrap_with=clauses) as solver:
+            result = solver.solve()
+    except Exception:
+        # e.g. a backend that is not compiled into this PySAT build
+        result = None
+    results.put((name, result, time.perf_counter() - start))
+
+
+def solve_portfolio(formula, solvers=PORTFOLIO, timeout=None):
+    """
+    Races several PySAT backends on the same formula in parallel processes.
+
+    The first backend to return an answer wins; the others are terminated.
+
+    Args:
+        formula (CNF): The formula to solve.
+        solvers (tuple): PySAT solver names, one worker process each.
+        timeout (float): Wall-clock limit in seconds, or None for no limit.
+    Returns:
+        tuple: (result, winner, elapsed)
+        - result (bool): The answer, or None if no backend finished in time.
+        - winner (str): Name of the winning backend, or None.
+        - elapsed (float): Wall-clock seconds until the answer (or timeout).
+    """
+    start = time.perf_counter()
+    results = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(
+            target=_portfolio_worker,
+            args=(name, formula.clauses, results),
+            daemon=True,
+        )
+        for name in solvers
+    ]
+    for worker in workers:
+        worker.start()
+
+    result, winner = None, None
+    try:
+        for _ in workers:
+            remaining = None
+            if timeout is not None:
+                remaining = max(0.0, timeout - (time.perf_counter() - start))
+            try:
+                name, answer, _ = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if answer is not None:
+                result, winner = answer, name
+                break
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+
+    return result, winner, time.perf_counter() - start
+
+
+def solve_budgeted(
+    formula, name="m22", conflicts=None, propagations=None, timeout=None
+):
+    """
+    Solves a formula under conflict, propagation and wall-clock budgets.
+
+    Args:
+        formula (CNF): The formula to solve.
+        name (str): PySAT solver name; it must support solve_limited.
+        conflicts (int): Conflict budget, or None for no limit.
+        propagations (int): Propagation budget, or None for no limit.
+        timeout (float): Wall-clock limit in seconds, or None for no limit.
+    Returns:
+        tuple: (result, stats)
+        - result (bool): The answer, or None if a budget ran out first.
+        - stats (dict): Solver statistics from accum_stats() (conflicts,
+          decisions, propagations, restarts), their per-second rates, and
+          the solve time in seconds.
+    """
+    with Solver(name=name, bootstrap_with=formula.clauses) as solver:
+        if conflicts is not None:
+            solver.conf_budget(conflicts)
+        if propagations is not None:
+            solver.prop_budget(propagations)
+
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, solver.interrupt)
+            timer.start()
+
+        start = time.perf_counter()
+        try:
+            result = solver.solve_limited(expect_interrupt=timer is not None)
+        finally:
+            if timer is not None:
+                timer.cancel()
+        elapsed = time.perf_counter() - start
+
+        stats = dict(solver.accum_stats())
+
+    for key in ("conflicts", "decisions", "propagations"):
+        stats[f"{key}_per_s"] = stats.get(key, 0) / elapsed if elapsed > 0 else 0.0
+    stats["solve_s"] = elapsed
+    return result, stats
+
+
 # Example of plotting runtimes
 def loop_n_times(n):
     i = 0
@@ -48,27 +391,12 @@ def loop_n_times(n):
 
 
 if __name__ == "__main__":
-    n_values = range(4, 15)
-    runtimes = []
-
-    for n in n_values:
-        formula = pigeonhole(n)
-
-        start = time.time()
-
-        with Solver(name="m22") as solver:
-            solver.append_formula(formula.clauses)
-            result = solver.solve()
-
-        end = time.time()
-
-        runtimes.append(end - start)
+    # Timing, plotting and result files are handled by the shared harness, e.g.
+    #   python hw1_2a.py --n 4 15 --amo seqcounter --json sat.json --plot sat.png
+    # With a budget the sweep runs until an instance exceeds it:
+    #   python hw1_2a.py --n 4 --timeout 10
+    import sys
 
-        print(f"n={n}, SAT? {result}, time={end - start:.6f}s")
+    import hw1_bench
 
-    plt.plot(n_values, runtimes, marker="o")
-    plt.xlabel("n")
-    plt.ylabel("Runtime (seconds)")
-    plt.title("Pigeonhole SAT Runtime vs n")
-    plt.grid(True)
-    plt.show()
+    hw1_bench.main(["sat", *sys.argv[1:]])
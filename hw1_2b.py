@@ -1,38 +1,223 @@
-from dd import autoref as _bdd
-import matplotlib.pyplot as plt
+import heapq
 import time
 
+import hw1_bdd_backend as _backend
+from hw1_2b_bdd_helper import ReorderMonitor, support
 
-def pigeonhole(n):
-    "TODO: Implement your solution to the problem here."
-    bdd = _bdd.BDD()
+# Static variable orders for the x_{i}_{j} placement variables
+ORDERS = ("pigeon", "hole", "interleaved", "force")
 
-    holes = n - 1
-
-    # Declare variables
-    names = []
-    for i in range(n):
-        for j in range(holes):
-            name = f"x_{i}_{j}"
-            names.append(name)
-            bdd.declare(name)
+# Conjunction schedules, see conjoin()
+SCHEDULES = ("linear", "tree", "cluster", "smallest")
 
-    vars = {name: bdd.var(name) for name in names}
 
-    formula = bdd.true
+def pigeonhole_clauses(n):
+    """
+    Returns the pigeon-hole clauses as lists of (variable name, polarity).
 
+    The order matches the original construction: one "pigeon i is in some
+    hole" clause per pigeon, then "not both i and j in hole k" per hole.
+    """
+    holes = n - 1
+    clauses = []
     for i in range(n):
-        clause = bdd.false
-        for j in range(holes):
-            clause |= vars[f"x_{i}_{j}"]
-        formula &= clause
-
+        clauses.append([(f"x_{i}_{j}", True) for j in range(holes)])
     for k in range(holes):
         for i in range(n):
             for j in range(i + 1, n):
-                xi = vars[f"x_{i}_{k}"]
-                xj = vars[f"x_{j}_{k}"]
-                formula &= ~(xi & xj)
+                clauses.append([(f"x_{i}_{k}", False), (f"x_{j}_{k}", False)])
+    return clauses
+
+
+def force_order(names, clauses, iterations=50):
+    """
+    Orders variables with the FORCE heuristic (Aloul, Markov & Sakallah).
+
+    Each clause pulls its variables towards its center of gravity; variables
+    are repeatedly re-sorted by the average center of the clauses they occur
+    in, until the total clause span stops decreasing.
+    """
+    position = {name: p for p, name in enumerate(names)}
+    edges = [[name for name, _ in clause] for clause in clauses]
+
+    def span():
+        return sum(
+            max(position[v] for v in e) - min(position[v] for v in e) for e in edges
+        )
+
+    best, best_span = list(names), span()
+    for _ in range(iterations):
+        total = {name: 0.0 for name in names}
+        count = {name: 0 for name in names}
+        for e in edges:
+            center = sum(position[v] for v in e) / len(e)
+            for v in e:
+                total[v] += center
+                count[v] += 1
+        order = sorted(
+            names,
+            key=lambda v: (
+                total[v] / count[v] if count[v] else position[v],
+                position[v],
+            ),
+        )
+        position = {name: p for p, name in enumerate(order)}
+        current = span()
+        if current >= best_span:
+            break
+        best, best_span = order, current
+    return best
+
+
+def variable_order(n, order, clauses=None):
+    """Returns the names of the pigeon-hole variables in the given order."""
+    holes = n - 1
+    cells = [(i, j) for i in range(n) for j in range(holes)]
+    if order == "pigeon":
+        pass
+    elif order == "hole":
+        cells.sort(key=lambda c: (c[1], c[0]))
+    elif order == "interleaved":
+        # anti-diagonals of the pigeon x hole matrix
+        cells.sort(key=lambda c: (c[0] + c[1], c[0]))
+    elif order == "force":
+        names = [f"x_{i}_{j}" for i, j in cells]
+        return force_order(names, clauses or pigeonhole_clauses(n))
+    else:
+        raise ValueError(f"Unknown variable order: {order}")
+    return [f"x_{i}_{j}" for i, j in cells]
+
+
+def _tree(terms, on_result):
+    while len(terms) > 1:
+        merged = []
+        for a, b in zip(terms[::2], terms[1::2]):
+            merged.append(a & b)
+            on_result(merged[-1])
+        if len(terms) % 2:
+            merged.append(terms[-1])
+        terms = merged
+    return terms[0]
+
+
+def conjoin(bdd, terms, schedule="linear", on_result=None):
+    """
+    Returns the conjunction of `terms`, scheduled as given:
+
+      - "linear":   fold left to right into one accumulator.
+      - "tree":     balanced binary-tree reduction of neighbouring terms.
+      - "cluster":  group terms by their topmost support variable, conjoin
+                    each group, then tree-reduce the groups.
+      - "smallest": always conjoin the two smallest BDDs (priority queue).
+
+    `on_result` is called with every intermediate conjunction.
+    """
+    on_result = on_result or (lambda u: None)
+    terms = list(terms)
+    if not terms:
+        return bdd.true
+
+    if schedule == "linear":
+        formula = bdd.true
+        for term in terms:
+            formula &= term
+            on_result(formula)
+        return formula
+
+    if schedule == "tree":
+        return _tree(terms, on_result)
+
+    if schedule == "cluster":
+        levels = bdd.var_levels
+        clusters = {}
+        for term in terms:
+            top = min((levels[v] for v in support(term)), default=-1)
+            clusters.setdefault(top, []).append(term)
+        groups = []
+        for top in sorted(clusters):
+            group = bdd.true
+            for term in clusters[top]:
+                group &= term
+                on_result(group)
+            groups.append(group)
+        return _tree(groups, on_result)
+
+    if schedule == "smallest":
+        # the counter breaks ties so that BDDs are never compared
+        heap = [(term.dag_size, k, term) for k, term in enumerate(terms)]
+        heapq.heapify(heap)
+        counter = len(heap)
+        while len(heap) > 1:
+            _, _, a = heapq.heappop(heap)
+            _, _, b = heapq.heappop(heap)
+            u = a & b
+            on_result(u)
+            heapq.heappush(heap, (u.dag_size, counter, u))
+            counter += 1
+        return heap[0][2]
+
+    raise ValueError(f"Unknown conjunction schedule: {schedule}")
+
+
+def pigeonhole(
+    n,
+    order="pigeon",
+    stats=None,
+    reorder=None,
+    schedule="linear",
+    backend=None,
+    **reorder_options,
+):
+    """
+    Builds the pigeon-hole BDD with one x_{i}_{j} variable per pigeon and hole.
+
+    `order` is one of ORDERS and `schedule` one of SCHEDULES (see conjoin).
+    `backend` names the BDD implementation (see hw1_bdd_backend).
+    `reorder` and `reorder_options` configure a ReorderMonitor (see
+    hw1_2b_bdd_helper). If `stats` is a dict, it receives the build time,
+    the monitor's statistics (peak nodes, reorderings) and the largest
+    intermediate conjunction (peak_intermediate, in nodes).
+    """
+    bdd = _backend.BDD(backend)
+
+    clauses = pigeonhole_clauses(n)
+
+    # Declare variables; BDD size depends heavily on this order
+    names = variable_order(n, order, clauses)
+    for name in names:
+        bdd.declare(name)
+
+    vars = {name: bdd.var(name) for name in names}
+
+    start = time.perf_counter()
+    monitor = ReorderMonitor(bdd, reorder, **reorder_options)
+
+    terms = []
+    for clause in clauses:
+        c = bdd.false
+        for name, positive in clause:
+            c |= vars[name] if positive else ~vars[name]
+        terms.append(c)
+
+    peak_intermediate = 0
+
+    def on_result(u):
+        nonlocal peak_intermediate
+        if stats is not None:
+            peak_intermediate = max(peak_intermediate, u.dag_size)
+        monitor.step()
+
+    formula = conjoin(bdd, terms, schedule, on_result)
+
+    if stats is not None:
+        stats.update(monitor.stats())
+        stats.update(
+            order=order,
+            schedule=schedule,
+            nodes=len(bdd),
+            peak_intermediate=peak_intermediate,
+            build_s=time.perf_counter() - start,
+        )
 
     # Check UNSAT
     if formula == bdd.false:
@@ -43,42 +228,22 @@ def pigeonhole(n):
     return bdd, formula
 
 
+def zdd_pigeonhole(n, **options):
+    """
+    Same as pigeonhole, but built as a zero-suppressed decision diagram.
+
+    The returned manager is a dd.cudd_zdd.ZDD; compare its node counts with
+    pigeonhole(n, backend="cudd", ...), e.g. via
+    python hw1_bench.py bdd --backend cudd cudd_zdd
+    """
+    return pigeonhole(n, backend="cudd_zdd", **options)
+
+
 if __name__ == "__main__":
-    n_values = range(2, 10)  # increase until memory explodes
-    runtimes = []
-    node_counts = []
-
-    for n in n_values:
-        start = time.perf_counter()
-        bdd, formula = pigeonhole(n)
-        end = time.perf_counter()
-
-        runtime = end - start
-        runtimes.append(runtime)
-        node_counts.append(len(bdd))
-
-        print(
-            f"n={n}, UNSAT? {formula == bdd.false}, "
-            f"time={runtime:.4f}s, nodes={len(bdd)}"
-        )
+    # Timing, plotting and result files are handled by the shared harness, e.g.
+    #   python hw1_2b.py --n 2 10 --json bdd.json --plot bdd.png
+    import sys
+
+    import hw1_bench
 
-        # Optional cleanup
-        bdd.collect_garbage()
-
-    # Plot runtime
-    plt.figure()
-    plt.plot(n_values, runtimes, marker="o")
-    plt.xlabel("n")
-    plt.ylabel("Runtime (seconds)")
-    plt.title("BDD Construction Time vs n")
-    plt.grid(True)
-    plt.show()
-
-    # Plot node count
-    plt.figure()
-    plt.plot(n_values, node_counts, marker="o")
-    plt.xlabel("n")
-    plt.ylabel("Number of BDD nodes")
-    plt.title("BDD Size vs n")
-    plt.grid(True)
-    plt.show()
+    hw1_bench.main(["bdd", *sys.argv[1:]])
@@ -12,15 +12,28 @@
 #                                                                               #
 #################################################################################
 
-from dd import autoref as _bdd
+import hw1_bdd_backend as _backend
+from hw1_tseitin import Circuit
 
 import argparse
+import contextlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import time
+import warnings
 
-def example1(pdfname, n):
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def example1(pdfname, n, backend=None):
     print ('  [Example 1]: Creating BDDs that involve simple propositional operators.')
 
     # Create a BDD manager. We only need one.
-    bdd = _bdd.BDD()
+    bdd = _backend.BDD(backend)
     # Create variables x and y.
     bdd.declare('x', 'y')
     # Get pointers to these variables.
@@ -43,14 +56,14 @@ def example1(pdfname, n):
     else:
         print ('  - Uh oh! Should never get here.')
 
-    bdd.collect_garbage()
-    bdd.dump(pdfname)
+    _backend.collect_garbage(bdd)
+    save_bdd(pdfname, [z, w, g])
 
-def example2(pdfname, n):
+def example2(pdfname, n, backend=None):
     print ('  [Example 2]: Create a BDD for an %d-bit less than expression.' % n)
 
     # Create a BDD manager. We only need one.
-    bdd = _bdd.BDD()
+    bdd = _backend.BDD(backend)
     # Create variables xs and ys.
     for i in range(n):
         bdd.declare('x%d' % i)
@@ -62,56 +75,299 @@ def example2(pdfname, n):
     xs = [bdd.var(xs_names_i) for xs_names_i in xs_names]
     ys = [bdd.var(ys_names_i) for ys_names_i in ys_names]
 
-    # Construct lt and ge expressions.
-    lt = nBitLT(xs, ys)
-    ge = nBitGE(xs, ys)
+    # Construct lt and ge expressions; they share the per-bit equalities.
+    with comparator_cache():
+        lt = nBitLT(xs, ys)
+        ge = nBitGE(xs, ys)
 
     # These two should be the negation of each other (i.e. mutually exclusive)
-    miter = (lt & ~ge) | (~lt & ge)
-    # Check if miter is true.
-    if miter == bdd.true:
+    if find_difference(lt, ~ge, xs_names + ys_names) is None:
         print ('  - nBitLT and nBitGE definitions seem correct.')
     else:
         print ('  - Uh oh! We should not get here.')
 
-    # Now let's try enumerating the assignments to lt.
+    # Now let's try enumerating the assignments to lt. iter_models streams
+    # them in increasing order of the bits xs + ys, i.e. sorted by x then y.
     print ('  - Enumerating assignments to less-than:')
-    strs = []
-    for m in bdd.pick_iter(lt):
-        x_str = assignmentToBinary(m,  xs_names)
-        y_str = assignmentToBinary(m,  ys_names)
-        strs += ['%s < %s' % (x_str, y_str)]
-    strs.sort()
-    for s in strs: print ('    -- %s' % s)
-    # We expect strs to have 1 + 2 + ... K = K*(K+1) / 2 assignments where K = 2**n - 1
+    for m in iter_models(lt, xs_names + ys_names):
+        x_str = format(m >> n, '0%db' % n)
+        y_str = format(m & ((1 << n) - 1), '0%db' % n)
+        print ('    -- %s < %s' % (x_str, y_str))
+    # We expect 1 + 2 + ... K = K*(K+1) / 2 assignments where K = 2**n - 1
     K = 2**n - 1
-    assert len(strs) == ((K * (K+1)) // 2)
+    assert count_models(lt) == ((K * (K+1)) // 2)
 
 def assignmentToBinary(m, vs):
     return ''.join(str(int(m[vi])) for vi in vs)
 
+def support(f):
+    """Return the set of variable names f depends on.
+
+    dd.cudd_zdd's Function.support is unreliable (it can change between
+    calls), so ZDD supports are found by cofactoring instead."""
+    bdd = f.bdd
+    if _backend.name_of(bdd) != 'cudd_zdd':
+        return f.support
+    return {v for v in bdd.vars if bdd.let({v: True}, f) != bdd.let({v: False}, f)}
+
+def count_models(f, nvars=None):
+    """Return the number of satisfying assignments of f as an exact int.
+
+    Like bdd.count, assignments range over the support of f unless nvars is
+    given. dd.cudd counts in doubles, which lose precision beyond 2**53
+    models, and dd.cudd_zdd's count is wrong for functions that do not
+    depend on every variable; for these two the count is computed from the
+    diagram itself, in time linear in its size."""
+    bdd = f.bdd
+    if nvars is None:
+        nvars = len(support(f))
+    zdd = _backend.name_of(bdd) == 'cudd_zdd'
+    if not zdd:
+        count = bdd.count(f, nvars=nvars)
+        if isinstance(count, int):
+            return count
+
+    # Count over all N declared variables, bottom-up from the constants
+    # (var None). In a BDD, levels skipped by an edge are free and a
+    # complemented handle (u.negated) has complemented children; in a ZDD,
+    # skipped levels are 0.
+    N = len(bdd.vars)
+    def level(u):
+        return N if u.var is None else u.level
+    def children(u):
+        if not zdd and u.negated:
+            return ~u.low, ~u.high
+        return u.low, u.high
+    def weight(u, c):
+        return 0 if zdd else level(c) - u.level - 1
+
+    counts = {}
+    stack = [f]
+    while stack:
+        u = stack[-1]
+        if int(u) in counts:
+            stack.pop()
+        elif u.var is None:
+            counts[int(u)] = int(u != bdd.false)
+            stack.pop()
+        else:
+            pending = [c for c in children(u) if int(c) not in counts]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            counts[int(u)] = sum(counts[int(c)] << weight(u, c)
+                                 for c in children(u))
+    total = counts[int(f)] << (0 if zdd else level(f))
+    # f does not depend on the other variables, so this division is exact
+    return (total << nvars) >> N
+
+def iter_models(f, names, rows=False):
+    """Lazily enumerate the satisfying assignments of f over the variables in
+    names, in increasing order with names[0] as the most significant bit.
+
+    Each model is yielded as a packed int, or with rows=True as a NumPy uint8
+    array of the bits in the order of names. names must cover the support of
+    f. Only one cofactor per variable is alive at a time, so memory stays
+    linear in len(names) however many models there are."""
+    missing = support(f) - set(names)
+    if missing:
+        raise ValueError('Variables missing from names: %s' % sorted(missing))
+    bdd = f.bdd
+    n = len(names)
+
+    def emit(m):
+        if rows:
+            return np.array([(m >> (n - 1 - i)) & 1 for i in range(n)],
+                            dtype=np.uint8)
+        return m
+
+    # Depth-first over the cofactors, 0 before 1: (depth, prefix, cofactor)
+    stack = [(0, 0, f)]
+    while stack:
+        depth, prefix, g = stack.pop()
+        if g == bdd.false:
+            continue
+        if g == bdd.true:
+            # every completion of the prefix is a model
+            free = n - depth
+            for m in range(prefix << free, (prefix + 1) << free):
+                yield emit(m)
+            continue
+        name = names[depth]
+        stack.append((depth + 1, 2 * prefix + 1, bdd.let({name: True}, g)))
+        stack.append((depth + 1, 2 * prefix, bdd.let({name: False}, g)))
+
+# File types written by save_bdd: node tables (see node_table) in JSON or
+# pickle containers, and dd's drawings, of which only DOT needs no graphviz.
+TABLE_FILETYPES = {'.json': 'json', '.p': 'pickle', '.pickle': 'pickle'}
+RENDERED_FILETYPES = ('.pdf', '.png', '.svg')
+
+def node_table(roots):
+    """Return the functions in roots as a plain node table:
+
+      {'vars': variable names in level order,
+       'nodes': [[var index, low id, high id], ...] with children first,
+       'roots': ids}
+
+    where ids 0 and 1 are false and true and id k + 2 is nodes[k]. Nodes
+    have plain BDD semantics on every backend: complemented edges (dd.cudd)
+    are pushed down and the levels a ZDD edge skips (dd.cudd_zdd, meaning
+    0) become explicit nodes, so any manager can load the table."""
+    bdd = roots[0].bdd
+    zdd = _backend.name_of(bdd) == 'cudd_zdd'
+    names = sorted(bdd.vars, key=bdd.level_of_var)
+    N = len(names)
+    nodes = []
+    unique = {}
+    ids = {}
+
+    def level(u):
+        return N if u.var is None else u.level
+    def children(u):
+        if not zdd and u.negated:
+            return ~u.low, ~u.high
+        return u.low, u.high
+    def add(var, low, high):
+        if low == high:
+            return low
+        key = (var, low, high)
+        if key not in unique:
+            nodes.append([var, low, high])
+            unique[key] = len(nodes) + 1
+        return unique[key]
+    def zeros(target, top, bottom):
+        # a ZDD edge that skips the levels top..bottom-1 sets them to 0
+        if zdd:
+            for lev in reversed(range(top, bottom)):
+                target = add(lev, target, 0)
+        return target
+
+    stack = [f for f in roots]
+    while stack:
+        u = stack[-1]
+        if int(u) in ids:
+            stack.pop()
+        elif u.var is None:
+            ids[int(u)] = int(u != bdd.false)
+            stack.pop()
+        else:
+            pending = [c for c in children(u) if int(c) not in ids]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            low, high = (zeros(ids[int(c)], u.level + 1, level(c))
+                         for c in children(u))
+            ids[int(u)] = add(u.level, low, high)
+    return {'vars': names, 'nodes': nodes,
+            'roots': [zeros(ids[int(f)], 0, level(f)) for f in roots]}
+
+def from_node_table(table, bdd):
+    """Build the functions of a node_table in the manager bdd, declaring
+    missing variables, and return them in the order of table['roots']."""
+    bdd.declare(*table['vars'])
+    variables = [bdd.var(name) for name in table['vars']]
+    functions = [bdd.false, bdd.true]
+    for var, low, high in table['nodes']:
+        functions.append(bdd.ite(variables[var], functions[high], functions[low]))
+    return [functions[i] for i in table['roots']]
+
+def save_bdd(filename, roots):
+    """Write the functions in roots to filename, with the file type taken
+    from its extension: .json, .p or .pickle for a node table that
+    load_bdd can read back into any backend, or one of dd's drawings (.dot,
+    .pdf, .png, .svg). The rendered formats need graphviz; without it a DOT
+    file is written next to filename instead and its name is returned."""
+    ext = os.path.splitext(filename)[1]
+    if ext in TABLE_FILETYPES:
+        table = node_table(roots)
+        if TABLE_FILETYPES[ext] == 'json':
+            with open(filename, 'w') as f:
+                json.dump(table, f, separators=(',', ':'))
+        else:
+            with open(filename, 'wb') as f:
+                pickle.dump(table, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return filename
+    if ext in RENDERED_FILETYPES and shutil.which('dot') is None:
+        dotname = os.path.splitext(filename)[0] + '.dot'
+        logger.warning('graphviz not found, writing %s instead of %s',
+                       dotname, filename)
+        filename = dotname
+    roots[0].bdd.dump(filename, roots=roots)
+    return filename
+
+def load_bdd(filename, bdd=None, backend=None):
+    """Read a node table written by save_bdd into bdd (a new manager of the
+    given backend if None) and return (bdd, roots)."""
+    ext = os.path.splitext(filename)[1]
+    if ext not in TABLE_FILETYPES:
+        raise ValueError('Cannot load BDDs from %s files' % ext)
+    if TABLE_FILETYPES[ext] == 'json':
+        with open(filename) as f:
+            table = json.load(f)
+    else:
+        with open(filename, 'rb') as f:
+            table = pickle.load(f)
+    if bdd is None:
+        bdd = _backend.BDD(backend)
+    return bdd, from_node_table(table, bdd)
+
+def find_difference(a, b, names, solver='m22'):
+    """Return an assignment to names on which the functions a and b differ,
+    as a dict of bools, or None if they are equal.
+
+    a and b live in the same manager: a BDD manager, where equality is
+    decided by canonicity (same node) before a counterexample is picked from
+    the XOR miter, or a hw1_tseitin.Circuit, where the miter is handed to a
+    SAT solver (PySAT's `solver`)."""
+    if isinstance(a.bdd, Circuit):
+        miter = a ^ b
+        return a.bdd.solve(miter, name=solver) if int(miter) != -1 else None
+    if a == b:
+        return None
+    miter = a.bdd.apply('xor', a, b)
+    m = next(iter_models(miter, names))
+    n = len(names)
+    return {name: bool((m >> (n - 1 - i)) & 1) for i, name in enumerate(names)}
+
+def check_equivalence(build_a, build_b, names, method='bdd', backend=None,
+                      solver='m22'):
+    """Decide whether two functions over the variables in names are equal.
+
+    build_a and build_b take a manager and return their function; they only
+    need declare-d variables (manager.var), manager.true/false and &, |, ~.
+    With method='bdd' they are built as BDDs (on `backend`); with
+    method='sat' as one Tseitin-encoded circuit that is checked by the PySAT
+    solver `solver`, for widths where the BDDs blow up.
+
+    Returns (equivalent, counterexample) where counterexample is None or an
+    assignment to names (dict of bools) on which the functions differ."""
+    if method == 'bdd':
+        manager = _backend.BDD(backend)
+    elif method == 'sat':
+        manager = Circuit()
+    else:
+        raise ValueError('Unknown equivalence checking method: %s' % method)
+    manager.declare(*names)
+    cex = find_difference(build_a(manager), build_b(manager), names, solver)
+    return cex is None, cex
+
 def nBitLT(xs, ys):
     """Create a less-than expression for the n-bit vector of variables in xs
     and ys.
 
     xs and ys should be the same length. xs[0] and ys[0] are the most
     significant bits (MSBs)."""
+    return nBitCompare('LT', xs, ys)
 
-    assert (len(xs) == len(ys))
-    # We will use recursion to compute the less-than expression.
-    # 
-    # The recurrence we use is as follows:
-    # a[n:0] < b[n:0] == a[n] < b[n] \/ (a[n] = b[n] /\ a[n-1:0] < a[n-1:0])
-    #
-    # Also note: 
-    #   - a[i] < b[i] == ~a[i] /\ b[i]
-    #   - a[i] = b[i] == (a[i] /\ b[i]) \/ (~a[i] /\ ~b[i])
-    this_bit_lt = (~xs[0]) & (ys[0])
-    if len(xs) == 1:
-        return this_bit_lt
-    else:
-        this_bit_eq = (xs[0] & ys[0]) | (~xs[0] & ~ys[0])
-        return this_bit_lt | (this_bit_eq & nBitLT(xs[1:], ys[1:]))
+def nBitLE(xs, ys):
+    """Create a less-than-equal expression; see nBitLT."""
+    return nBitCompare('LE', xs, ys)
+
+def nBitGT(xs, ys):
+    """Create a greater-than expression; see nBitLT."""
+    return nBitCompare('GT', xs, ys)
 
 def nBitGE(xs, ys):
     """Create a greter-than-equal expression for the n-bit vector of variables
@@ -119,25 +375,190 @@ def nBitGE(xs, ys):
 
     xs and ys should be the same length. xs[0] and ys[0] are the most
     significant bits (MSBs)."""
+    return nBitCompare('GE', xs, ys)
 
-    assert (len(xs) == len(ys))
-    # We will use recursion to compute the greater-than-equal expression.
-    # 
-    # The recurrence we use is as follows:
-    # a[n:0] >= b[n:0] == a[n] > b[n] \/ (a[n] = b[n] /\ a[n-1:0] >= a[n-1:0])
-    #
-    # Also note: 
-    #   - a[i] > b[i] == a[i] /\ ~b[i]
-    #   - a[i] >= b[i] == a[i] \/ ~b[i])
-    #   - a[i] = b[i] == (a[i] /\ b[i]) \/ (~a[i] /\ ~b[i])
-    if len(xs) == 1:
-        this_bit_ge = xs[0] | ~ys[0]
-        return this_bit_ge
-    else:
-        this_bit_gt = xs[0] & ~ys[0]
-        this_bit_eq = (xs[0] & ys[0]) | (~xs[0] & ~ys[0])
-        return this_bit_gt | (this_bit_eq & nBitGE(xs[1:], ys[1:]))
+def nBitEQ(xs, ys):
+    """Create an equality expression; see nBitLT."""
+    return nBitCompare('EQ', xs, ys)
+
+
+# Comparators built inside the innermost comparator_cache() scope, keyed by
+# (id(manager), kind, xs, ys) with xs and ys as tuples of node ids, or None
+# outside of any scope. Each entry keeps its inputs alive so that node ids
+# are not reused while the entry exists. The entries also keep their manager
+# alive, which is why the cache only lives as long as its scope.
+_comparator_cache = None
+
+# Result for zero remaining bits, and the bit-wise "strictly decides" term.
+_COMPARATORS = {
+    'LT': (False, lambda x, y: ~x & y),
+    'LE': (True, lambda x, y: ~x & y),
+    'GT': (False, lambda x, y: x & ~y),
+    'GE': (True, lambda x, y: x & ~y),
+    'EQ': (True, None),
+}
+
+@contextlib.contextmanager
+def comparator_cache():
+    """Share comparators (and their per-bit equalities) between the
+    nBitCompare calls made inside the with block, e.g. an LT and a GE over
+    the same vectors. The cache is dropped, with the managers and nodes it
+    holds on to, when the block exits. Without it, nothing is cached."""
+    global _comparator_cache
+    outer = _comparator_cache
+    _comparator_cache = {}
+    try:
+        yield
+    finally:
+        _comparator_cache = outer
+
+def clear_comparator_cache():
+    """Forget the comparators cached in the current comparator_cache() scope."""
+    if _comparator_cache is not None:
+        _comparator_cache.clear()
+
+def _cached(kind, xs, ys, build):
+    if _comparator_cache is None:
+        return build()
+    key = (id(xs[0].bdd), kind,
+           tuple(int(x) for x in xs), tuple(int(y) for y in ys))
+    entry = _comparator_cache.get(key)
+    if entry is None:
+        entry = _comparator_cache[key] = (build(), xs, ys)
+    return entry[0]
+
+def _bit_equalities(xs, ys):
+    # Shared by all comparators over the same vectors.
+    # a[i] = b[i] == (a[i] /\ b[i]) \/ (~a[i] /\ ~b[i])
+    return _cached('bits', xs, ys, lambda: [
+        (x & y) | (~x & ~y) for x, y in zip(xs, ys)])
+
+def nBitCompare(kind, xs, ys):
+    """Create the comparison `xs kind ys` for kind in LT, LE, GT, GE or EQ.
+
+    xs and ys should be the same, non-zero length, MSB first; constants
+    (bdd.true, bdd.false) may stand for bits. Inside a comparator_cache()
+    block, results are cached per manager and operands.
+
+    The comparator is built from the LSB up, using the recurrence
+      a[n:0] < b[n:0] == a[n] < b[n] \/ (a[n] = b[n] /\ a[n-1:0] < b[n-1:0])
+    with the base case false for < and > and true for <=, >= and =."""
+    if kind not in _COMPARATORS:
+        raise ValueError('Unknown comparison: %s' % kind)
+    assert len(xs) == len(ys) and len(xs) > 0
+    xs, ys = list(xs), list(ys)
+
+    def build():
+        empty, decides = _COMPARATORS[kind]
+        bdd = xs[0].bdd
+        result = bdd.true if empty else bdd.false
+        equal = _bit_equalities(xs, ys)
+        for i in reversed(range(len(xs))):
+            if decides is None:
+                result = equal[i] & result
+            else:
+                result = decides(xs[i], ys[i]) | (equal[i] & result)
+        return result
+
+    return _cached(kind, xs, ys, build)
+
+
+class ReorderMonitor:
+    """Track the size of a BDD manager during construction and control
+    variable reordering.
+
+    Call step() after every conjunction. The mode decides when to reorder:
+
+      - None:        never.
+      - 'native':    dd reorders on its own (bdd.configure(reordering=True)).
+                     With CUDD, events and their duration come from the
+                     manager's statistics; with dd.autoref they are detected
+                     from changes of the variable order, duration unknown.
+      - 'threshold': sift whenever the manager still exceeds `threshold`
+                     nodes after garbage collection; the threshold then
+                     becomes `growth` times the size after sifting.
+      - 'batch':     sift after every `batch` conjunctions.
+
+    Each reordering is logged (at INFO level) and recorded in `events` as
+    (step, nodes before, nodes after, seconds); `trace` holds the manager
+    size after every step. Sizes are len(bdd), which for dd.autoref includes
+    dead nodes not yet collected (CUDD frees them on its own), so `peak`
+    only compares between runs on the same backend."""
+
+    MODES = (None, 'native', 'threshold', 'batch')
+
+    def __init__(self, bdd, mode=None, threshold=10000, growth=2.0, batch=100):
+        if mode not in self.MODES:
+            raise ValueError('Unknown reordering mode: %s' % mode)
+        self.bdd = bdd
+        self.mode = mode
+        self.threshold = threshold
+        self.growth = growth
+        self.batch = batch
+        self.steps = 0
+        self.peak = len(bdd)
+        self.trace = []
+        self.events = []
+        bdd.configure(reordering=(mode == 'native'))
+        self._levels = bdd.var_levels if mode == 'native' else None
+        self._native = self._native_counters() if mode == 'native' else None
+
+    def step(self):
+        self.steps += 1
+        nodes = len(self.bdd)
+        self.peak = max(self.peak, nodes)
+        self.trace.append((self.steps, nodes))
+        logger.debug('step %d: %d nodes', self.steps, nodes)
+
+        if self.mode == 'native' and self._native is not None:
+            counters = self._native_counters()
+            if counters[0] > self._native[0]:
+                self._record(None, nodes, counters[1] - self._native[1])
+                self._native = counters
+        elif self.mode == 'native':
+            levels = self.bdd.var_levels
+            if levels != self._levels:
+                self._record(None, nodes, None)
+                self._levels = levels
+        elif self.mode == 'threshold' and nodes > self.threshold:
+            # Much of the excess is often dead nodes; only sift if GC is not enough
+            _backend.collect_garbage(self.bdd)
+            if len(self.bdd) > self.threshold:
+                self.reorder()
+                self.threshold = max(self.threshold, self.growth * len(self.bdd))
+        elif self.mode == 'batch' and self.steps % self.batch == 0:
+            self.reorder()
+
+    def _native_counters(self):
+        # (reorderings, seconds) as counted by CUDD; dd.autoref has no such
+        # statistics. dd warns about a units change on every call.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            stats = self.bdd.statistics()
+        if 'n_reorderings' not in stats:
+            return None
+        return stats['n_reorderings'], stats['reordering_time']
+
+    def reorder(self):
+        """Sift now (this also collects garbage)."""
+        before = len(self.bdd)
+        start = time.perf_counter()
+        self.bdd.reorder()
+        self._record(before, len(self.bdd), time.perf_counter() - start)
+
+    def _record(self, before, after, seconds):
+        self.events.append((self.steps, before, after, seconds))
+        logger.info('reordering at step %d: %s -> %d nodes (%s s)',
+                    self.steps, before, after, seconds)
 
+    def stats(self):
+        return {
+            'peak_nodes': self.peak,
+            'reorderings': len(self.events),
+            'reorder_s': sum(e[3] or 0.0 for e in self.events),
+            'trace': self.trace,
+            'events': self.events,
+        }
 
 
 def main():
@@ -149,7 +570,8 @@ def main():
     example_help_message = 'Example to run (1-%d). Default=1.' % len(examples)
     parser.add_argument("--example", type=int, help=example_help_message, default=1, choices=example_choices)
     parser.add_argument("--n", type=int, help='Value of n (default=2). (Used only in example 2)', default=2)
-    parser.add_argument("--pdf", type=str, help='PDF image output filename (Used only in example 1.)', default='bdd.pdf')
+    parser.add_argument("--pdf", type=str, help='Output filename; .pdf/.png/.svg need graphviz, .dot/.json/.p do not (Used only in example 1.)', default='bdd.pdf')
+    parser.add_argument("--backend", type=str, help='BDD backend (default=%s).' % _backend.default(), choices=_backend.available())
     args = parser.parse_args()
 
     # Print a header.
@@ -157,7 +579,7 @@ def main():
     
     # Run the example.
     ex_to_run = examples[args.example-1]
-    ex_to_run(args.pdf, args.n)
+    ex_to_run(args.pdf, args.n, args.backend)
 
 if __name__ == '__main__':
     main()
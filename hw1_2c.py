@@ -1,12 +1,37 @@
 import math
 
-from dd import autoref as _bdd
-
-
-def nlogn_pigeonhole(n):
+import hw1_bdd_backend as _backend
+from hw1_2b_bdd_helper import ReorderMonitor, nBitLT
+
+# How "pigeon i sits in one of the holes" is encoded
+RANGES = ("enumerate", "comparator")
+
+
+def nlogn_pigeonhole(
+    n,
+    stats=None,
+    reorder=None,
+    backend=None,
+    range_check="enumerate",
+    **reorder_options,
+):
+    """
+    Builds the pigeon-hole BDD with each pigeon's hole as a log2(n-1)-bit number.
+
+    `range_check` restricts each pigeon to the holes 0..n-2: "enumerate" ORs
+    one minterm per hole (O(holes * bits) operations), "comparator" builds
+    pigeon < n-1 with nBitLT against the constant (O(bits) operations).
+    `reorder` and `reorder_options` configure a ReorderMonitor (see
+    hw1_2b_bdd_helper); if `stats` is a dict, it receives the monitor's
+    statistics (peak nodes, reorderings, trace) and the largest intermediate
+    formula (peak_intermediate, in nodes). `backend` names the BDD
+    implementation (see hw1_bdd_backend).
+    """
+    if range_check not in RANGES:
+        raise ValueError(f"Unknown range check: {range_check}")
     print(f"[O(n log n) Pigeonhole encoding for n={n}]")
 
-    bdd = _bdd.BDD()
+    bdd = _backend.BDD(backend)
 
     holes = n - 1
     bits = math.ceil(math.log2(holes))
@@ -15,37 +40,68 @@ def nlogn_pigeonhole(n):
         for b in range(bits):
             bdd.declare(f"p{i}_b{b}")
 
-    def pigeon_bits(i):
-        return [bdd.var(f"p{i}_b{b}") for b in range(bits)]
-
-    formula = bdd.true
+    # x[i][b] is bit b of pigeon i; looked up once instead of per use
+    x = [[bdd.var(f"p{i}_b{b}") for b in range(bits)] for i in range(n)]
 
-    for i in range(n):
+    def pigeon_bits(i):
+        return x[i]
+
+    def rename(template, pigeons):
+        """Moves a template written over pigeons 0, 1, ... onto `pigeons`."""
+        mapping = {
+            f"p{k}_b{b}": x[i][b]
+            for k, i in enumerate(pigeons)
+            if k != i
+            for b in range(bits)
+        }
+        return bdd.let(mapping, template) if mapping else template
+
+    monitor = ReorderMonitor(bdd, reorder, **reorder_options)
+
+    # allow only values 0..holes-1, built once for pigeon 0
+    if range_check == "comparator":
+        # nBitLT expects the most significant bit first
+        constant = [bdd.true if (holes >> b) & 1 else bdd.false for b in range(bits)]
+        if holes == 2**bits:
+            # every bit pattern is a hole (and the constant has no room)
+            valid = bdd.true
+        else:
+            valid = nBitLT(pigeon_bits(0)[::-1], constant[::-1])
+    else:
         valid = bdd.false
-
-        # allow only values 0..holes-1
         for h in range(holes):
             assignment = bdd.true
-            for b in range(bits):
-                bit = (h >> b) & 1
-                v = bdd.var(f"p{i}_b{b}")
-                assignment &= v if bit else ~v
+            for b, v in enumerate(pigeon_bits(0)):
+                assignment &= v if (h >> b) & 1 else ~v
             valid |= assignment
 
-        formula &= valid
+    # pigeons 0 and 1 in the same hole, built once
+    equal = bdd.true
+    for xi, xj in zip(pigeon_bits(0), pigeon_bits(1)):
+        equal &= (xi & xj) | (~xi & ~xj)
 
-    for i in range(n):
-        for j in range(i + 1, n):
-            equal = bdd.true
-            for b in range(bits):
-                xi = bdd.var(f"p{i}_b{b}")
-                xj = bdd.var(f"p{j}_b{b}")
+    formula = bdd.true
+    peak_intermediate = 0
 
-                # bit equality
-                equal &= (xi & xj) | (~xi & ~xj)
+    def step():
+        nonlocal peak_intermediate
+        if stats is not None:
+            peak_intermediate = max(peak_intermediate, formula.dag_size)
+        monitor.step()
 
+    for i in range(n):
+        formula &= rename(valid, [i])
+        step()
+
+    for i in range(n):
+        for j in range(i + 1, n):
             # forbid equality
-            formula &= ~equal
+            formula &= ~rename(equal, [i, j])
+            step()
+
+    if stats is not None:
+        stats.update(monitor.stats())
+        stats["peak_intermediate"] = peak_intermediate
 
     if formula == bdd.false:
         print("UNSAT proven with O(n log n) encoding.")
@@ -55,5 +111,10 @@ def nlogn_pigeonhole(n):
     return formula
 
 
+def zdd_nlogn_pigeonhole(n, **options):
+    """Same as nlogn_pigeonhole, but built as a zero-suppressed decision diagram."""
+    return nlogn_pigeonhole(n, backend="cudd_zdd", **options)
+
+
 if __name__ == "__main__":
     nlogn_pigeonhole(4)
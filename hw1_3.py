@@ -121,8 +121,18 @@ def load_dataset():
 # ========================================================================
 # END OF DO NOT MODIFY
 # ========================================================================
+import argparse
+import contextlib
+import functools
+import io
+import itertools
+import time
+
 from tqdm import tqdm
 
+import hw1_cache
+from hw1_tseitin import Circuit
+
 # ============================================================================
 # TODO  Q3 (i)  –  Initial Conditions
 # ============================================================================
@@ -238,6 +248,79 @@ def update_rules(zeros_train, ones_train):
     return z3.And(constraints)
 
 
+def mux_and_or_const(sel_is_and, a, x):
+    # mux_and_or(sel_is_and, a, x) for a known x:
+    # a∧True = a and a∨True = True; a∧False = False and a∨False = a
+    if x:
+        return z3.Or(z3.Not(sel_is_and), a)
+    return z3.And(z3.Not(sel_is_and), a)
+
+
+def folded_row_rules(row, state):
+    """
+    Folded update rules of one image row, from column 0 to column 7.
+
+    Parameters
+    ----------
+    row : numpy.ndarray
+        The row's 8 pixels.
+    state : callable
+        state(j, k) returns the row's state variable v^k_j.
+
+    Returns
+    -------
+    list of z3.BoolRef
+        The constraints of the 7 transitions.
+    """
+    op0_is_and = z3.Bool("op0_is_and")
+    op1_is_and = z3.Bool("op1_is_and")
+    op2_is_and = z3.Bool("op2_is_and")
+
+    constraints = []
+    for j in range(7):
+        x = bool(row[j] != row[j + 1])
+
+        v0_next = mux_and_or_const(op0_is_and, state(j, 0), x)
+        constraints.append(state(j + 1, 0) == v0_next)
+        for k in range(1, 4):
+            inner = mux_and_or_const(op2_is_and, state(j, k - 1), x)
+            expr = mux_and_or(op1_is_and, state(j, k), inner)
+            constraints.append(state(j + 1, k) == expr)
+    return constraints
+
+
+def update_rules_folded(zeros_train, ones_train):
+    """
+    Same constraints as update_rules, partially evaluated on the pixels.
+
+    x = p_{i,j} xor p_{i,j+1} is known when the constraints are generated, so
+    the muxes that read x collapse to an And/Or with the operator bit and no
+    Xor, BoolVal or If term is built for them (see folded_row_rules).
+
+    Parameters
+    ----------
+    zeros_train : numpy.ndarray
+        Training data for digit '0'.
+    ones_train : numpy.ndarray
+        Training data for digit '1'.
+
+    Returns
+    -------
+    z3.BoolRef
+        A Z3 conjunction (And) of constraints.
+    """
+    constraints = []
+
+    images = list(zeros_train) + list(ones_train)
+
+    for img, im in enumerate(tqdm(images, desc="Building folded update rules")):
+        for i in range(8):
+            state = functools.partial(V, img, i)
+            constraints.extend(folded_row_rules(im[i], state))
+
+    return z3.And(constraints)
+
+
 # ============================================================================
 # TODO  Q3 (iv)  –  Final Selection
 # ============================================================================
@@ -284,13 +367,444 @@ def final_selection(zeros_train, ones_train):
     return z3.And(constraints)
 
 
+# ============================================================================
+# Deduplicated encoding: one state trajectory per distinct row pattern
+# ============================================================================
+
+
+def distinct_rows(zeros_train, ones_train):
+    """
+    Find the distinct row patterns of the training images.
+
+    A row's states depend only on its pixels and the shared parameters, so
+    rows with equal pixels can share their state variables. There are at
+    most 2^8 = 256 distinct rows, whatever the number of images.
+
+    Parameters
+    ----------
+    zeros_train : numpy.ndarray
+        Training data for digit '0'.
+    ones_train : numpy.ndarray
+        Training data for digit '1'.
+
+    Returns
+    -------
+    rows : numpy.ndarray
+        The distinct rows, shape (R, 8).
+    row_ids : numpy.ndarray
+        row_ids[img, i] is the index in rows of row i of image img, with
+        images numbered as in update_rules (zeros first), shape (N, 8).
+    """
+    images = np.concatenate([zeros_train, ones_train]).astype(np.uint8)
+    rows, inverse = np.unique(images.reshape(-1, 8), axis=0, return_inverse=True)
+    return rows, inverse.reshape(len(images), 8)
+
+
+def R(r, j, k):
+    # state bit v^k_j of distinct row r
+    return z3.Bool(f"r_{r}_{j}_{k}")
+
+
+def row_constraints(zeros_train, ones_train):
+    """
+    Encode Q3 (i)-(iv) with state variables per distinct row.
+
+    The initial condition and the (folded) update rules are generated once
+    per distinct row pattern, and the final selection of each image refers
+    to the states of its rows. Images with the same set of rows and label
+    give the same final selection constraint and are encoded once. The
+    encoding size is therefore bounded by the 256 possible rows, not by the
+    number of images.
+
+    Parameters
+    ----------
+    zeros_train : numpy.ndarray
+        Training data for digit '0'.
+    ones_train : numpy.ndarray
+        Training data for digit '1'.
+
+    Returns
+    -------
+    z3.BoolRef
+        A Z3 conjunction (And) of constraints.
+    """
+    rows, row_ids = distinct_rows(zeros_train, ones_train)
+
+    c = z3.Bool("init_c")
+    s = [z3.Bool(f"sel_{k}") for k in range(4)]
+
+    constraints = [one_hot(s)]
+
+    for r, row in enumerate(rows):
+        for k in range(4):
+            constraints.append(R(r, 0, k) == c)
+        constraints.extend(folded_row_rules(row, functools.partial(R, r)))
+
+    labels = [False] * len(zeros_train) + [True] * len(ones_train)
+    images = dict.fromkeys(
+        (tuple(sorted(set(ids.tolist()))), label) for ids, label in zip(row_ids, labels)
+    )
+    for ids, label in images:
+        phi = [z3.Or([R(r, 7, k) for r in ids]) for k in range(4)]
+        y_hat = z3.Or([z3.And(s[k], z3.Not(phi[k])) for k in range(4)])
+        constraints.append(y_hat == z3.BoolVal(label))
+
+    return z3.And(constraints)
+
+
+def build_solver(zeros_train, ones_train, cache=False, folded=False, dedup=False):
+    """
+    Construct a Z3 solver holding the constraints of Q3 (i)-(iv).
+
+    Parameters
+    ----------
+    zeros_train : numpy.ndarray
+        Training data for digit '0'.
+    ones_train : numpy.ndarray
+        Training data for digit '1'.
+    cache : bool
+        Load each constraint family from the on-disk instance cache
+        (see hw1_cache) when present, instead of rebuilding it.
+    folded : bool
+        Use update_rules_folded instead of update_rules.
+    dedup : bool
+        Use row_constraints (always folded) instead of all three families.
+
+    Returns
+    -------
+    z3.Solver
+        A solver with the same solutions as the one built in train().
+    """
+    if dedup:
+        generators = (row_constraints,)
+    else:
+        rules = update_rules_folded if folded else update_rules
+        generators = (initial_condition, rules, final_selection)
+    solver = Solver()
+    for generator in generators:
+        if cache:
+            solver.add(hw1_cache.cached_smt(generator, zeros_train, ones_train))
+        else:
+            solver.add(generator(zeros_train, ones_train))
+    return solver
+
+
+# ============================================================================
+# Alternative backend: Tseitin CNF solved with PySAT
+# ============================================================================
+
+# The learnable Boolean parameters besides the one-hot selector sel_0..sel_3
+PARAMS = ("init_c", "op0_is_and", "op1_is_and", "op2_is_and")
+
+
+def _circuit_mux(sel_is_and, a, b):
+    # mux_and_or on hw1_tseitin gates
+    return (sel_is_and & (a & b)) | (~sel_is_and & (a | b))
+
+
+def encode_cnf(zeros_train, ones_train):
+    """
+    Encode the constraints of Q3 (i)-(iv) as a Tseitin circuit.
+
+    The parameters are the only circuit inputs; every state bit is a gate
+    over them. Pixels are constants, so gates fold as they are built, and
+    rows with equal pixels (and hence equal state bits) share their gates.
+
+    Parameters
+    ----------
+    zeros_train : numpy.ndarray
+        Training data for digit '0'.
+    ones_train : numpy.ndarray
+        Training data for digit '1'.
+
+    Returns
+    -------
+    circuit : hw1_tseitin.Circuit
+        The circuit; inputs are PARAMS and sel_0..sel_3.
+    roots : list of hw1_tseitin.Gate
+        The gates that must hold: the one-hot selector and one label
+        constraint per image.
+    """
+    circuit = Circuit()
+    circuit.declare(*PARAMS, *(f"sel_{k}" for k in range(4)))
+    c, op0, op1, op2 = (circuit.var(name) for name in PARAMS)
+    s = [circuit.var(f"sel_{k}") for k in range(4)]
+
+    at_most_one = circuit.true
+    for a in range(4):
+        for b in range(a + 1, 4):
+            at_most_one &= ~(s[a] & s[b])
+    roots = [(s[0] | s[1] | s[2] | s[3]) & at_most_one]
+
+    for img, im in enumerate(list(zeros_train) + list(ones_train)):
+        phi = [circuit.false] * 4
+        for i in range(8):
+            v = [c] * 4
+            for j in range(7):
+                x = circuit.true if im[i, j] != im[i, j + 1] else circuit.false
+                nxt = [_circuit_mux(op0, v[0], x)]
+                for k in range(1, 4):
+                    nxt.append(_circuit_mux(op1, v[k], _circuit_mux(op2, x, v[k - 1])))
+                v = nxt
+            phi = [phi[k] | v[k] for k in range(4)]
+
+        y_hat = circuit.false
+        for k in range(4):
+            y_hat |= s[k] & ~phi[k]
+        roots.append(~y_hat if img < len(zeros_train) else y_hat)
+
+    return circuit, roots
+
+
+def train_cnf(zeros_train, ones_train, solver="m22"):
+    """
+    Learn the classifier parameters with the CNF backend.
+
+    Parameters
+    ----------
+    zeros_train : numpy.ndarray
+        Training data for digit '0'.
+    ones_train : numpy.ndarray
+        Training data for digit '1'.
+    solver : str
+        The PySAT solver name.
+
+    Returns
+    -------
+    params : dict or None
+        PARAMS -> bool plus "sel" -> the selected k, or None if no parameters
+        classify every image.
+    stats : dict
+        Build and solve time in seconds and the CNF size.
+    """
+    start = time.perf_counter()
+    circuit, roots = encode_cnf(zeros_train, ones_train)
+    built = time.perf_counter()
+    model = circuit.solve(*roots, name=solver)
+    solved = time.perf_counter()
+
+    stats = {
+        "build_s": built - start,
+        "solve_s": solved - built,
+        "vars": circuit.nv,
+        "clauses": len(circuit.clauses) + len(roots),
+    }
+    if model is None:
+        return None, stats
+    params = {name: model[name] for name in PARAMS}
+    params["sel"] = next(k for k in range(4) if model[f"sel_{k}"])
+    return params, stats
+
+
+# ============================================================================
+# NumPy engine: bit-parallel simulation of the scanner
+# ============================================================================
+
+
+def scan_rows(rows, init_c, op0_is_and, op1_is_and, op2_is_and):
+    """
+    Run the row scanner on many rows under many parameter settings at once.
+
+    Rows are packed 8 to a byte (np.packbits), so each update rule is a few
+    bitwise operations on a (P, ceil(M / 8)) array, and the parameters turn
+    into 0x00/0xFF masks that select AND or OR per setting.
+
+    Parameters
+    ----------
+    rows : numpy.ndarray
+        Binarized rows, shape (M, 8).
+    init_c, op0_is_and, op1_is_and, op2_is_and : numpy.ndarray
+        The parameter settings, bool arrays of shape (P,).
+
+    Returns
+    -------
+    numpy.ndarray
+        Final state bits v^k_7, bool array of shape (P, 4, M).
+    """
+    rows = np.asarray(rows, dtype=bool)
+    x = np.packbits(rows[:, 1:] != rows[:, :-1], axis=0)  # (W, 7)
+
+    def mask(bits):
+        return np.where(np.asarray(bits, dtype=bool)[:, None], 0xFF, 0).astype(np.uint8)
+
+    c, op0, op1, op2 = map(mask, (init_c, op0_is_and, op1_is_and, op2_is_and))
+
+    def mux(op, a, b):
+        # mux_and_or on packed bits
+        return (op & a & b) | (~op & (a | b))
+
+    v = [np.broadcast_to(c, (len(c), x.shape[0]))] * 4
+    for j in range(7):
+        xj = x[:, j]
+        v = [mux(op0, v[0], xj)] + [
+            mux(op1, v[k], mux(op2, xj, v[k - 1])) for k in range(1, 4)
+        ]
+    return np.unpackbits(np.stack(v, axis=1), axis=2, count=len(rows)).astype(bool)
+
+
+def classify_rows(final, row_ids, sel):
+    """
+    Combine scanned rows into image outputs: ¬(OR over rows of v^sel_7).
+
+    Parameters
+    ----------
+    final : numpy.ndarray
+        Output of scan_rows, shape (P, 4, M).
+    row_ids : numpy.ndarray
+        Row indices into final per image, shape (N, 8).
+    sel : numpy.ndarray
+        The selected k per parameter setting, shape (P,).
+
+    Returns
+    -------
+    numpy.ndarray
+        The predicted labels (True for digit '1'), shape (P, N).
+    """
+    chosen = final[np.arange(len(sel)), sel]  # (P, M)
+    return ~chosen[:, row_ids].any(axis=2)
+
+
+def consistent_params(zeros_train, ones_train):
+    """
+    Find every parameter setting that classifies all training images.
+
+    All 2^4 * 4 = 64 candidates are simulated at once with scan_rows on the
+    distinct rows (see distinct_rows), which takes milliseconds.
+
+    Parameters
+    ----------
+    zeros_train : numpy.ndarray
+        Training data for digit '0'.
+    ones_train : numpy.ndarray
+        Training data for digit '1'.
+
+    Returns
+    -------
+    list of dict
+        PARAMS -> bool plus "sel" -> the selected k, as returned by
+        train_cnf, one per consistent setting.
+    """
+    rows, row_ids = distinct_rows(zeros_train, ones_train)
+    grid = np.array(list(itertools.product([False, True], repeat=4)))
+    grid = np.repeat(grid, 4, axis=0)  # (64, 4): each setting with k = 0..3
+    sel = np.tile(np.arange(4), 16)
+
+    y_hat = classify_rows(scan_rows(rows, *grid.T), row_ids, sel)
+    labels = np.r_[np.zeros(len(zeros_train), bool), np.ones(len(ones_train), bool)]
+    ok = (y_hat == labels).all(axis=1)
+
+    return [
+        {**dict(zip(PARAMS, map(bool, grid[p]))), "sel": int(sel[p])}
+        for p in np.flatnonzero(ok)
+    ]
+
+
+def predict(images, params):
+    """
+    Classify a batch of images with learned parameters.
+
+    All rows of all images are scanned at once with scan_rows.
+
+    Parameters
+    ----------
+    images : numpy.ndarray
+        Binarized images, shape (N, 8, 8).
+    params : dict
+        PARAMS -> bool plus "sel" -> the selected k, as returned by train(),
+        train_cnf or consistent_params.
+
+    Returns
+    -------
+    numpy.ndarray
+        The predicted labels, True for digit '1', shape (N,).
+    """
+    images = np.asarray(images)
+    settings = [[params[name]] for name in PARAMS]
+    final = scan_rows(images.reshape(-1, 8), *settings)
+    row_ids = np.arange(8 * len(images)).reshape(-1, 8)
+    return classify_rows(final, row_ids, np.array([params["sel"]]))[0]
+
+
+def evaluate(zeros, ones, params):
+    """
+    Score learned parameters on labelled images.
+
+    Parameters
+    ----------
+    zeros : numpy.ndarray
+        Images of digit '0', shape (N0, 8, 8).
+    ones : numpy.ndarray
+        Images of digit '1', shape (N1, 8, 8).
+    params : dict
+        The parameters, see predict.
+
+    Returns
+    -------
+    dict
+        accuracy, the number of images, the seconds predict took and the
+        resulting images per second.
+    """
+    images = np.concatenate([zeros, ones])
+    labels = np.r_[np.zeros(len(zeros), bool), np.ones(len(ones), bool)]
+    start = time.perf_counter()
+    y_hat = predict(images, params)
+    elapsed = time.perf_counter() - start
+    return {
+        "accuracy": float((y_hat == labels).mean()),
+        "images": len(images),
+        "seconds": elapsed,
+        "images_per_s": len(images) / elapsed if elapsed > 0 else float("inf"),
+    }
+
+
+def compare_backends(zeros_train, ones_train):
+    """Learn the parameters with Z3 (plain, folded and deduplicated
+    encodings), with the CNF backend and with the NumPy brute force, report
+    the times of each and cross-check the CNF result."""
+    variants = (
+        ("z3", {}),
+        ("z3 folded", {"folded": True}),
+        ("z3 dedup", {"dedup": True}),
+    )
+    for name, options in variants:
+        start = time.perf_counter()
+        with contextlib.redirect_stderr(io.StringIO()):  # tqdm progress bars
+            solver = build_solver(zeros_train, ones_train, **options)
+        built = time.perf_counter()
+        result = solver.check()
+        solved = time.perf_counter()
+        print(
+            f"{name}: {result}, build={built - start:.3f}s, "
+            f"solve={solved - built:.3f}s"
+        )
+
+    params, stats = train_cnf(zeros_train, ones_train)
+    print(
+        f"cnf: {'sat' if params else 'unsat'}, build={stats['build_s']:.3f}s, "
+        f"solve={stats['solve_s']:.3f}s, vars={stats['vars']}, "
+        f"clauses={stats['clauses']}"
+    )
+    print("cnf parameters:", params)
+
+    start = time.perf_counter()
+    candidates = consistent_params(zeros_train, ones_train)
+    elapsed = time.perf_counter() - start
+    print(f"numpy: {len(candidates)} consistent of 64, {elapsed * 1000:.2f}ms")
+    for candidate in candidates:
+        print("  ", candidate)
+    if params is not None and params not in candidates:
+        print("Uh oh! The CNF parameters fail the NumPy simulation.")
+
+
 # ============================================================================
 # Training loop  (Needs Some Modification)
 # ============================================================================
 
 
 def train():
-    """Invoke Z3 to `learn' parameters that classify all training images."""
+    """Invoke Z3 to `learn' parameters that classify all training images.
+
+    Returns the parameters as a dict (see train_cnf), or None."""
 
     # ========================================================================
     # DO NOT MODIFY: Data Loading and Constraint Generation
@@ -353,9 +867,33 @@ def train():
             else "unknown",
         )
         print("sel vector   =", sel_vals)
+
+        # The same parameters as a dict, for predict()
+        params = {
+            name: z3.is_true(model.eval(z3.Bool(name), model_completion=True))
+            for name in PARAMS
+        }
+        params["sel"] = next((k for k, v in enumerate(sel_vals) if z3.is_true(v)), 0)
+        return params
     else:
         print("Uh oh! No satisfying assignment found.")
+        return None
 
 
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Compare the Z3 and CNF (PySAT) backends instead of training.",
+    )
+    if parser.parse_args().compare:
+        compare_backends(*load_dataset())
+    else:
+        params = train()
+        if params is not None:
+            score = evaluate(*load_dataset(), params)
+            print(
+                f"\naccuracy     = {score['accuracy']:.4f} on {score['images']} "
+                f"images ({score['images_per_s']:.0f} images/s)"
+            )
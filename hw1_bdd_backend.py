@@ -0,0 +1,83 @@
+"""
+Selects the BDD implementation used by the Problem 2 code.
+
+dd provides a pure-Python implementation (dd.autoref) and, when it is built
+with CUDD, a C-backed one (dd.cudd) that is orders of magnitude faster, plus
+CUDD zero-suppressed decision diagrams (dd.cudd_zdd). All three managers
+support declare, var, &, |, ~, ==, len (node count), dag_size, count, let,
+support, pick_iter, configure and reorder, so code written against one runs
+unchanged on the others. The helpers below cover the few places where they
+differ.
+"""
+
+from dd import autoref
+
+try:
+    from dd import cudd
+except ImportError:
+    cudd = None
+
+try:
+    from dd import cudd_zdd
+except ImportError:
+    cudd_zdd = None
+
+
+BACKENDS = ("autoref", "cudd", "cudd_zdd")
+
+_MODULES = {"autoref": autoref, "cudd": cudd, "cudd_zdd": cudd_zdd}
+
+
+def available():
+    """Returns the names of the backends that can be imported here."""
+    return [name for name in BACKENDS if _MODULES[name] is not None]
+
+
+def default():
+    """Returns the fastest available backend: cudd if present, else autoref."""
+    return "cudd" if cudd is not None else "autoref"
+
+
+def module(name=None):
+    """
+    Returns the dd module implementing a backend.
+
+    Args:
+        name (str): One of BACKENDS, or None for default().
+    Returns:
+        module: dd.autoref, dd.cudd or dd.cudd_zdd.
+    """
+    name = name or default()
+    if name not in _MODULES:
+        raise ValueError(f"Unknown BDD backend: {name}")
+    if _MODULES[name] is None:
+        raise ImportError(f"BDD backend {name} is not available (dd built without it)")
+    return _MODULES[name]
+
+
+def BDD(name=None):
+    """
+    Returns a new, empty manager of the given backend (default: default()).
+
+    For "cudd_zdd" this is a ZDD manager; it represents the same Boolean
+    functions behind the same interface, only with zero-suppressed nodes.
+    CUDD managers start with dynamic reordering on and dd.autoref with it
+    off; every manager is returned with it off, so that all backends build
+    the same way unless reordering is asked for (see ReorderMonitor).
+    """
+    mod = module(name)
+    bdd = mod.ZDD() if mod is cudd_zdd else mod.BDD()
+    bdd.configure(reordering=False)
+    return bdd
+
+
+def name_of(bdd):
+    """Returns the backend name of a manager created by BDD()."""
+    return type(bdd).__module__.rpartition(".")[2]
+
+
+def collect_garbage(bdd):
+    """Frees unreferenced nodes; CUDD does this on its own and has no such call."""
+    collect = getattr(bdd, "collect_garbage", None)
+    if collect is not None:
+        collect()
@@ -0,0 +1,574 @@
+"""
+Benchmark harness for the pigeon-hole encodings of Problem 2.
+
+Sweeps n for the SAT pigeonhole (hw1_2a), the BDD pigeonhole (hw1_2b) and
+the O(n log n) BDD encoding (hw1_2c). Every n gets warm-up runs and repeated
+trials with separate encode/solve timings and the peak RSS of the process.
+Results are written as JSON or CSV so that runs can be compared across
+commits; plots are optional and rendered off-screen, so nothing blocks on a
+display.
+
+Example:
+    python hw1_bench.py sat --n 4 13 --trials 3 --json sat.json --plot sat.png
+"""
+
+import argparse
+import contextlib
+import csv
+import datetime
+import functools
+import gc
+import io
+import itertools
+import json
+import logging
+import multiprocessing
+import platform
+import resource
+import statistics
+import subprocess
+import time
+
+import hw1_2a
+import hw1_2b
+import hw1_2c
+import hw1_bdd_backend
+import hw1_cache
+from hw1_2b_bdd_helper import ReorderMonitor
+
+
+def _sat_trial(
+    n,
+    amo="pairwise",
+    symmetry_breaking=False,
+    portfolio=False,
+    timeout=None,
+    conflicts=None,
+    propagations=None,
+    cache=False,
+):
+    start = time.perf_counter()
+    build = (
+        functools.partial(hw1_cache.cached_cnf, hw1_2a.pigeonhole)
+        if cache
+        else hw1_2a.pigeonhole
+    )
+    formula = build(
+        n,
+        vectorized=amo == "pairwise",
+        amo=amo,
+        symmetry_breaking=symmetry_breaking,
+    )
+    encoded = time.perf_counter()
+
+    if portfolio:
+        result, solver, _ = hw1_2a.solve_portfolio(formula, timeout=timeout)
+        stats = {}
+    else:
+        solver = "m22"
+        result, stats = hw1_2a.solve_budgeted(
+            formula, solver, conflicts, propagations, timeout
+        )
+        del stats["solve_s"]
+    solved = time.perf_counter()
+
+    return {
+        "encode_s": encoded - start,
+        "solve_s": solved - encoded,
+        "sat": result,
+        "solver": solver,
+        **hw1_2a.encoding_size(formula, n),
+        **stats,
+    }
+
+
+# Monitor statistics copied into result rows; trace and events are per-step
+# lists, kept in the JSON output only
+_MONITOR_KEYS = ("peak_nodes", "reorderings", "reorder_s", "trace", "events")
+_PER_STEP_KEYS = ("trace", "events")
+
+
+def _reorder_stats(stats):
+    return {key: stats[key] for key in _MONITOR_KEYS}
+
+
+def _reorder_options(reorder_threshold=None, reorder_batch=None):
+    options = {"threshold": reorder_threshold, "batch": reorder_batch}
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def _bdd_trial(
+    n,
+    order="pigeon",
+    schedule="linear",
+    backend=None,
+    reorder=None,
+    **reorder_options,
+):
+    stats = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bdd, formula = hw1_2b.pigeonhole(
+            n,
+            order=order,
+            stats=stats,
+            reorder=reorder,
+            schedule=schedule,
+            backend=backend,
+            **_reorder_options(**reorder_options),
+        )
+    encoded = time.perf_counter()
+    sat = formula != bdd.false
+    solved = time.perf_counter()
+    # dd.autoref keeps dead nodes until collected, CUDD does not
+    hw1_bdd_backend.collect_garbage(bdd)
+
+    return {
+        "encode_s": encoded - start,
+        "solve_s": solved - encoded,
+        "sat": sat,
+        "backend": hw1_bdd_backend.name_of(bdd),
+        "nodes": len(bdd),
+        "peak_intermediate": stats["peak_intermediate"],
+        **_reorder_stats(stats),
+    }
+
+
+def _bdd_log_trial(
+    n, range_check="enumerate", backend=None, reorder=None, **reorder_options
+):
+    stats = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        formula = hw1_2c.nlogn_pigeonhole(
+            n,
+            stats=stats,
+            reorder=reorder,
+            backend=backend,
+            range_check=range_check,
+            **_reorder_options(**reorder_options),
+        )
+    encoded = time.perf_counter()
+    sat = formula != formula.bdd.false
+    solved = time.perf_counter()
+    hw1_bdd_backend.collect_garbage(formula.bdd)
+
+    return {
+        "encode_s": encoded - start,
+        "solve_s": solved - encoded,
+        "sat": sat,
+        "backend": hw1_bdd_backend.name_of(formula.bdd),
+        "nodes": len(formula.bdd),
+        "peak_intermediate": stats["peak_intermediate"],
+        **_reorder_stats(stats),
+    }
+
+
+# name -> (one trial for a given n, default n range, command-line options)
+BENCHMARKS = {
+    "sat": (
+        _sat_trial,
+        (4, 15),
+        (
+            "amo",
+            "symmetry_breaking",
+            "portfolio",
+            "timeout",
+            "conflicts",
+            "propagations",
+            "cache",
+        ),
+    ),
+    "bdd": (
+        _bdd_trial,
+        (2, 10),
+        (
+            "order",
+            "schedule",
+            "backend",
+            "reorder",
+            "reorder_threshold",
+            "reorder_batch",
+        ),
+    ),
+    "bdd_log": (
+        _bdd_log_trial,
+        (3, 10),
+        ("range_check", "backend", "reorder", "reorder_threshold", "reorder_batch"),
+    ),
+}
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process so far, in KiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Budget options whose names clash with solver statistics in the result rows
+_BUDGET_KEYS = {"conflicts": "conflict_budget", "propagations": "propagation_budget"}
+
+
+def run_trials(benchmark, n, trials=3, warmup=1, **options):
+    """
+    Runs one benchmark at one n.
+
+    Args:
+        benchmark (str): A key of BENCHMARKS.
+        n (int): The number of pigeons.
+        trials (int): Number of measured runs.
+        warmup (int): Number of unmeasured runs before the trials.
+        **options: Passed to the benchmark's trial function.
+    Returns:
+        list: One result row (dict) per trial.
+    """
+    trial = BENCHMARKS[benchmark][0]
+    for _ in range(warmup):
+        trial(n, **options)
+
+    rows = []
+    for t in range(trials):
+        gc.collect()
+        row = {"benchmark": benchmark, "n": n, "trial": t}
+        row.update(
+            {_BUDGET_KEYS.get(key, key): value for key, value in options.items()}
+        )
+        row.update(trial(n, **options))
+        row["total_s"] = row["encode_s"] + row["solve_s"]
+        # ru_maxrss is a high-water mark; use isolate=True in sweep() to get
+        # a per-n value instead of the maximum over the whole sweep.
+        row["peak_rss_kb"] = peak_rss_kb()
+        rows.append(row)
+    return rows
+
+
+def _isolated_trials(results, args, options):
+    results.put(run_trials(*args, **options))
+
+
+def sweep(benchmark, n_values, trials=3, warmup=1, isolate=False, **options):
+    """
+    Runs a benchmark for every n and prints one summary line per n.
+
+    The sweep stops early at the first n where a trial exceeded its budget
+    (a "sat" result of None) or, with a timeout, took longer than the timeout
+    including encoding, so n_values may be unbounded.
+
+    Args:
+        benchmark (str): A key of BENCHMARKS.
+        n_values (iterable): The values of n to run.
+        trials (int): Number of measured runs per n.
+        warmup (int): Number of unmeasured runs per n.
+        isolate (bool): Run each n in a fresh process, so that peak RSS is
+            measured per n.
+        **options: Passed to the benchmark's trial function.
+    Returns:
+        list: All result rows.
+    """
+    rows = []
+    for n in n_values:
+        args = (benchmark, n, trials, warmup)
+        if isolate:
+            ctx = multiprocessing.get_context("spawn")
+            results = ctx.Queue()
+            worker = ctx.Process(target=_isolated_trials, args=(results, args, options))
+            worker.start()
+            n_rows = results.get()
+            worker.join()
+        else:
+            n_rows = run_trials(*args, **options)
+        rows.extend(n_rows)
+
+        def median(key):
+            return statistics.median(row[key] for row in n_rows)
+
+        last = n_rows[-1]
+        summary = [
+            f"{benchmark} n={n}",
+            f"SAT? {last['sat']}",
+            f"encode={median('encode_s'):.6f}s",
+            f"solve={median('solve_s'):.6f}s",
+            f"total={median('total_s'):.6f}s",
+            f"peak_rss={last['peak_rss_kb'] / 1024:.1f}MiB",
+        ]
+        if "clauses" in last:
+            summary.append(f"clauses={last['clauses']}")
+            summary.append(f"aux_vars={last['aux_vars']}")
+        if "solver" in last:
+            summary.append(f"solver={last['solver']}")
+        if "conflicts" in last:
+            summary.append(f"conflicts={last['conflicts']}")
+            summary.append(f"decisions/s={median('decisions_per_s'):.0f}")
+            summary.append(f"propagations/s={median('propagations_per_s'):.0f}")
+        if "nodes" in last:
+            summary.append(f"nodes={last['nodes']}")
+        if "peak_nodes" in last:
+            summary.append(f"peak_nodes={last['peak_nodes']}")
+        if "peak_intermediate" in last:
+            summary.append(f"peak_intermediate={last['peak_intermediate']}")
+        if last.get("reorderings"):
+            summary.append(f"reorderings={last['reorderings']}")
+            summary.append(f"reorder={median('reorder_s'):.6f}s")
+        print(", ".join(summary))
+
+        timeout = options.get("timeout")
+        if any(
+            row["sat"] is None or (timeout is not None and row["total_s"] > timeout)
+            for row in n_rows
+        ):
+            print(f"{benchmark} n={n} exceeded the budget, stopping the sweep.")
+            break
+    return rows
+
+
+def _metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+
+
+def write_results(rows, path):
+    """
+    Writes result rows to `path` as JSON or CSV, chosen by its extension.
+    CSV has one value per cell, so it leaves out the per-step trace and events.
+    """
+    if path.endswith(".json"):
+        with open(path, "w") as f:
+            json.dump({"meta": _metadata(), "results": rows}, f, indent=2)
+    elif path.endswith(".csv"):
+        fields = list(
+            dict.fromkeys(
+                key for row in rows for key in row if key not in _PER_STEP_KEYS
+            )
+        )
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        raise ValueError(f"Cannot infer output format from file name: {path}")
+
+
+def print_side_by_side(rows, keys=("nodes", "peak_intermediate")):
+    """
+    Prints node counts per n with one column group per backend.
+
+    The defaults compare across backends: nodes is counted after garbage
+    collection and peak_intermediate is a dag_size. peak_nodes is not, as
+    dd.autoref counts dead nodes until they are collected.
+    """
+    backends = list(dict.fromkeys(row["backend"] for row in rows))
+    ns = sorted({row["n"] for row in rows})
+    last = {(row["backend"], row["n"]): row for row in rows}
+
+    header = ["n"] + [f"{backend} {key}" for backend in backends for key in keys]
+    print(" | ".join(f"{h:>18}" for h in header))
+    for n in ns:
+        cells = [str(n)]
+        for backend in backends:
+            row = last.get((backend, n), {})
+            cells += [str(row.get(key, "-")) for key in keys]
+        print(" | ".join(f"{c:>18}" for c in cells))
+
+
+def plot_results(rows, path):
+    """Plots median runtime (and node count, if any) against n into `path`."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    def series(row):
+        if "backend" in row:
+            return f"{row['benchmark']} ({row['backend']})"
+        return row["benchmark"]
+
+    labels = list(dict.fromkeys(series(row) for row in rows))
+    with_nodes = any("nodes" in row for row in rows)
+    fig, axes = plt.subplots(
+        1, 2 if with_nodes else 1, figsize=(12 if with_nodes else 6, 4)
+    )
+    axes = axes if with_nodes else [axes]
+
+    for label in labels:
+        ns = sorted({row["n"] for row in rows if series(row) == label})
+        per_n = [
+            [row for row in rows if series(row) == label and row["n"] == n] for n in ns
+        ]
+        axes[0].plot(
+            ns,
+            [statistics.median(r["total_s"] for r in rs) for rs in per_n],
+            marker="o",
+            label=label,
+        )
+        if with_nodes and "nodes" in per_n[0][0]:
+            axes[1].plot(ns, [rs[-1]["nodes"] for rs in per_n], marker="o", label=label)
+
+    axes[0].set_xlabel("n")
+    axes[0].set_ylabel("Runtime (seconds)")
+    axes[0].set_title("Pigeonhole Runtime vs n")
+    if with_nodes:
+        axes[1].set_xlabel("n")
+        axes[1].set_ylabel("Number of BDD nodes")
+        axes[1].set_title("BDD Size vs n")
+    for ax in axes:
+        ax.grid(True)
+        ax.legend()
+
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("benchmark", choices=BENCHMARKS)
+    parser.add_argument(
+        "--n",
+        type=int,
+        nargs="+",
+        metavar="N",
+        help="Range of n as START [STOP], as in range(START, STOP). Without "
+        "STOP a budgeted sat sweep runs until an instance exceeds the budget.",
+    )
+    parser.add_argument(
+        "--trials", type=int, default=3, help="Measured runs per n (default=3)."
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=1, help="Warm-up runs per n (default=1)."
+    )
+    parser.add_argument(
+        "--isolate", action="store_true", help="Run each n in a fresh process."
+    )
+    parser.add_argument("--json", type=str, help="Write results to this JSON file.")
+    parser.add_argument("--csv", type=str, help="Write results to this CSV file.")
+    parser.add_argument("--plot", type=str, help="Save a plot to this image file.")
+    parser.add_argument(
+        "--amo", choices=hw1_2a.AMO_ENCODINGS, help="At-most-one encoding (sat only)."
+    )
+    parser.add_argument(
+        "--symmetry-breaking",
+        action="store_true",
+        help="Add lex-leader symmetry-breaking clauses (sat only).",
+    )
+    parser.add_argument(
+        "--portfolio",
+        action="store_true",
+        help="Race the hw1_2a.PORTFOLIO backends (sat only).",
+    )
+    parser.add_argument(
+        "--timeout", type=float, help="Wall-clock seconds per solve (sat only)."
+    )
+    parser.add_argument(
+        "--conflicts", type=int, help="Conflict budget per solve (sat only)."
+    )
+    parser.add_argument(
+        "--propagations", type=int, help="Propagation budget per solve (sat only)."
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Load formulas from the instance cache, see hw1_cache (sat only).",
+    )
+    parser.add_argument(
+        "--order", choices=hw1_2b.ORDERS, help="BDD variable order (bdd only)."
+    )
+    parser.add_argument(
+        "--schedule",
+        choices=hw1_2b.SCHEDULES,
+        help="BDD conjunction schedule (bdd only).",
+    )
+    parser.add_argument(
+        "--range-check",
+        choices=hw1_2c.RANGES,
+        help="How pigeons are restricted to the holes (bdd_log only).",
+    )
+    parser.add_argument(
+        "--backend",
+        nargs="+",
+        choices=hw1_bdd_backend.available(),
+        help="BDD backends (bdd, bdd_log; default="
+        f"{hw1_bdd_backend.default()}). With several, node counts are "
+        "compared side by side.",
+    )
+    parser.add_argument(
+        "--reorder",
+        choices=[mode for mode in ReorderMonitor.MODES if mode],
+        help="Dynamic BDD reordering mode (bdd, bdd_log).",
+    )
+    parser.add_argument(
+        "--reorder-threshold",
+        type=int,
+        help="Node count that triggers sifting in threshold mode.",
+    )
+    parser.add_argument(
+        "--reorder-batch",
+        type=int,
+        help="Conjunctions between sifting runs in batch mode.",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="count",
+        default=0,
+        help="Log BDD reordering events to stderr; twice (-vv) also logs the "
+        "node count after every conjunction.",
+    )
+    args = parser.parse_args(argv)
+
+    if args.verbose:
+        level = logging.DEBUG if args.verbose > 1 else logging.INFO
+        logging.basicConfig(level=level, format="%(message)s")
+        # dd logs every sifting step at INFO level
+        logging.getLogger("dd").setLevel(logging.WARNING)
+
+    known = {key for _, _, keys in BENCHMARKS.values() for key in keys}
+    options = {key: getattr(args, key) for key in known if getattr(args, key)}
+    unsupported = [key for key in options if key not in BENCHMARKS[args.benchmark][2]]
+    if unsupported:
+        parser.error(
+            f"not supported by the {args.benchmark} benchmark: "
+            + ", ".join("--" + key.replace("_", "-") for key in unsupported)
+        )
+    if args.portfolio and (args.conflicts or args.propagations):
+        parser.error("the portfolio only supports --timeout")
+
+    start, stop = BENCHMARKS[args.benchmark][1]
+    if args.n:
+        if len(args.n) > 2:
+            parser.error("--n takes START [STOP]")
+        start = args.n[0]
+        stop = args.n[1] if len(args.n) == 2 else None
+    budgeted = args.timeout or args.conflicts or args.propagations
+    if stop is None and not budgeted:
+        stop = max(start + 1, BENCHMARKS[args.benchmark][1][1])
+    # Several backends are swept one after the other and compared at the end
+    backends = options.pop("backend", None) or [None]
+    rows = []
+    for backend in backends:
+        if backend is not None:
+            options["backend"] = backend
+        n_values = itertools.count(start) if stop is None else range(start, stop)
+        rows += sweep(
+            args.benchmark, n_values, args.trials, args.warmup, args.isolate, **options
+        )
+    if len(backends) > 1:
+        print_side_by_side(rows)
+
+    for path in (args.json, args.csv):
+        if path:
+            write_results(rows, path)
+    if args.plot:
+        plot_results(rows, args.plot)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
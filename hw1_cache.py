@@ -0,0 +1,160 @@
+"""
+Content-addressed on-disk cache for generated instances.
+
+An instance is identified by the generator that builds it, the parameters it
+is called with and the source of the generator's module, so editing an
+encoding invalidates its cached instances automatically. Entries are stored
+under $HW1_CACHE_DIR (default: .hw1_cache next to this file) as
+
+  - <key>.npz   CNF formulas as flat int32 literal / int64 offset buffers
+                (see hw1_2a.pigeonhole_flat), stored uncompressed: zlib
+                makes them 5x smaller but takes longer to write than the
+                encodings take to build,
+  - <key>.smt2  Z3 constraints as SMT-LIB.
+
+Files are written to a temporary name and renamed, so concurrent sweeps
+never see a partial entry. Delete the directory to clear the cache.
+"""
+
+import functools
+import hashlib
+import inspect
+import itertools
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import z3
+from pysat.formula import CNF
+
+import hw1_2a
+
+CACHE_DIR_ENV = "HW1_CACHE_DIR"
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".hw1_cache"
+)
+
+
+def cache_dir():
+    """Returns the cache directory, creating it if needed."""
+    path = os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash(module_name):
+    source = inspect.getsource(sys.modules[module_name])
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _canonical(value):
+    # JSON-able stand-in for a parameter; arrays are represented by a digest
+    if isinstance(value, np.ndarray):
+        digest = hashlib.sha256(np.ascontiguousarray(value).tobytes()).hexdigest()
+        return ["ndarray", str(value.dtype), list(value.shape), digest]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in sorted(value.items())}
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot derive a cache key from {type(value).__name__}")
+
+
+def cache_key(generator, args=(), kwargs=None):
+    """
+    Returns the content address of generator(*args, **kwargs).
+
+    Args:
+        generator (function): A module-level function that builds an instance.
+        args (tuple): Its positional parameters.
+        kwargs (dict): Its keyword parameters.
+    Returns:
+        str: A sha256 hex digest of the generator's qualified name, the
+        parameters and the source of the generator's module.
+    """
+    payload = {
+        "generator": f"{generator.__module__}.{generator.__qualname__}",
+        "params": _canonical([list(args), kwargs or {}]),
+        "source": _source_hash(generator.__module__),
+    }
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _path(generator, args, kwargs, suffix):
+    return os.path.join(cache_dir(), cache_key(generator, args, kwargs) + suffix)
+
+
+def _write_atomic(path, write):
+    # write(tmp_path) must create the file
+    fd, tmp = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix=os.path.splitext(path)[1]
+    )
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def cached_cnf(generator, *args, **kwargs):
+    """
+    Returns generator(*args, **kwargs), a CNF, from the cache if possible.
+
+    Returns:
+        CNF: The formula; loaded formulas have the same clauses and nv.
+    """
+    path = _path(generator, args, kwargs, ".npz")
+    if os.path.exists(path):
+        with np.load(path) as data:
+            formula = CNF()
+            formula.clauses = hw1_2a.flat_to_clauses(data["lits"], data["offsets"])
+            formula.nv = int(data["nv"])
+        return formula
+
+    formula = generator(*args, **kwargs)
+    widths = np.fromiter(map(len, formula.clauses), dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(widths)))
+    lits = np.fromiter(
+        itertools.chain.from_iterable(formula.clauses),
+        dtype=np.int32,
+        count=int(offsets[-1]),
+    )
+    _write_atomic(
+        path,
+        lambda tmp: np.savez(tmp, lits=lits, offsets=offsets, nv=formula.nv),
+    )
+    return formula
+
+
+def cached_smt(generator, *args, **kwargs):
+    """
+    Returns the Z3 constraint generator(*args, **kwargs) from the cache if
+    possible.
+
+    Returns:
+        z3.BoolRef: The constraint; loaded constraints are the conjunction of
+        the parsed SMT-LIB assertions.
+    """
+    path = _path(generator, args, kwargs, ".smt2")
+    if os.path.exists(path):
+        return z3.And(*z3.parse_smt2_file(path))
+
+    constraint = generator(*args, **kwargs)
+    solver = z3.Solver()
+    solver.add(constraint)
+
+    def write(tmp):
+        with open(tmp, "w") as f:
+            f.write(solver.to_smt2())
+
+    _write_atomic(path, write)
+    return constraint
@@ -0,0 +1,148 @@
+"""
+Boolean circuits with a Tseitin encoding into CNF for PySAT.
+
+A Circuit mimics the part of the dd BDD manager interface used to build
+formulas (declare, var, true, false and &, |, ~, ^ on the results), so code
+that builds a function from a manager, such as the comparators in
+hw1_2b_bdd_helper, can build a circuit instead. Every gate gets one CNF
+variable; constants are folded and structurally equal gates are shared, so
+the CNF grows linearly with the circuit rather than with the size of the
+function it computes.
+"""
+
+from pysat.formula import CNF
+from pysat.solvers import Solver
+
+
+class Gate:
+    """
+    The output of a circuit gate, as a CNF literal.
+
+    Args:
+        circuit (Circuit): The circuit the gate belongs to.
+        lit (int): Its literal; negative for a negated output.
+    """
+
+    __slots__ = ("bdd", "lit")
+
+    def __init__(self, circuit, lit):
+        # named like dd's Function.bdd, which points to the manager
+        self.bdd = circuit
+        self.lit = lit
+
+    def __int__(self):
+        return self.lit
+
+    def __invert__(self):
+        return Gate(self.bdd, -self.lit)
+
+    def __and__(self, other):
+        return Gate(self.bdd, self.bdd._and(self.lit, other.lit))
+
+    def __or__(self, other):
+        return Gate(self.bdd, -self.bdd._and(-self.lit, -other.lit))
+
+    def __xor__(self, other):
+        return Gate(self.bdd, self.bdd._xor(self.lit, other.lit))
+
+    def __repr__(self):
+        return f"Gate({self.lit})"
+
+
+class Circuit:
+    """
+    An and-xor-inverter circuit whose gates are Tseitin-encoded as they are
+    created.
+
+    Variable 1 is the constant true; inputs and gates get the next free
+    variables. `clauses` holds the gate definitions, `vars` maps input names
+    to their variables.
+    """
+
+    def __init__(self):
+        self.clauses = [[1]]
+        self.nv = 1
+        self.vars = {}
+        self.true = Gate(self, 1)
+        self.false = Gate(self, -1)
+        self._gates = {}
+
+    def declare(self, *names):
+        """Adds inputs (existing names are kept)."""
+        for name in names:
+            if name not in self.vars:
+                self.nv += 1
+                self.vars[name] = self.nv
+
+    def var(self, name):
+        """Returns the input `name`, which must have been declared."""
+        return Gate(self, self.vars[name])
+
+    def _gate(self, key, encode):
+        lit = self._gates.get(key)
+        if lit is None:
+            self.nv += 1
+            lit = self._gates[key] = self.nv
+            self.clauses.extend(encode(lit))
+        return lit
+
+    def _and(self, a, b):
+        if a == -1 or b == -1 or a == -b:
+            return -1
+        if a == 1 or a == b:
+            return b
+        if b == 1:
+            return a
+        a, b = min(a, b), max(a, b)
+        return self._gate(("and", a, b), lambda g: [[-g, a], [-g, b], [g, -a, -b]])
+
+    def _xor(self, a, b):
+        # xor(~a, b) = ~xor(a, b), so only positive inputs are encoded
+        sign = 1 if (a > 0) == (b > 0) else -1
+        a, b = sorted((abs(a), abs(b)))
+        if a == b:
+            return -sign
+        if a == 1:
+            return -sign * b
+        g = self._gate(
+            ("xor", a, b),
+            lambda g: [[-g, a, b], [-g, -a, -b], [g, -a, b], [g, a, -b]],
+        )
+        return sign * g
+
+    def cnf(self, *roots):
+        """
+        Returns the circuit as a CNF, asserting the given gates.
+
+        Args:
+            roots (Gate): Gates that must be true.
+        Returns:
+            CNF: The gate definitions plus one unit clause per root.
+        """
+        formula = CNF()
+        formula.clauses = self.clauses + [[int(root)] for root in roots]
+        formula.nv = self.nv
+        return formula
+
+    def solve(self, *roots, name="m22"):
+        """
+        Looks for an input assignment that makes all roots true.
+
+        Args:
+            roots (Gate): Gates that must be true.
+            name (str): The PySAT solver name.
+        Returns:
+            dict or None: Input name -> bool, or None if unsatisfiable.
+        """
+        if any(int(root) == -1 for root in roots):
+            return None
+        with Solver(name=name, bootstrap_with=self.cnf(*roots).clauses) as solver:
+            if not solver.solve():
+                return None
+            model = solver.get_model()
+        # the model stops at the largest variable in a clause; inputs that no
+        # clause mentions are unconstrained and reported as False
+        return {
+            key: var <= len(model) and model[var - 1] > 0
+            for key, var in self.vars.items()
+        }